@@ -1,5 +1,65 @@
-from typing import List, Dict, Set, Tuple, Iterable, Union
-from graphviz import Digraph
+import time
+from array import array
+from contextlib import contextmanager
+from itertools import count
+from typing import List, Dict, Set, FrozenSet, Tuple, Iterable, Iterator, Callable, Union
+from graphviz import Source
+from regexp_process import SymbolClass, CaptureGroup, RegexpToken, RegexpNode, iter_postfix, is_operand
+
+
+# MARK: - Статистика
+
+class CompileStats:
+    """
+    Статистика построения автомата: время этапов (с) и счетчики. Передается параметром stats
+    в generate_min_dka_from_pregexp и функции, которые он вызывает; без stats замеров нет
+    Этапы: symbol_classes, thompson, compact, eps_closures, subsets, followpos, hopcroft, min_dka, expand
+    (и parse в CompileCache.compile); счетчики: nka_states (для followpos -- число позиций), eps_closures, eps_edges,
+    dka_states, partition_splits, min_dka_states
+    """
+
+    def __init__(self, on_stage: Callable[[str, float], None] = None):
+        """
+        :param on_stage: Вызывается после каждого этапа с его именем и временем
+        """
+        self.times: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.on_stage = on_stage
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator['CompileStats']:
+        st = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - st
+            self.times[name] = self.times.get(name, 0.0) + elapsed
+            if self.on_stage is not None:
+                self.on_stage(name, elapsed)
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @property
+    def total_time(self) -> float:
+        return sum(self.times.values())
+
+    def __str__(self):
+        lines = [f'{name:<16} {t:>10.4f} с' for name, t in self.times.items()]
+        lines += [f'{name:<16} {value:>10}' for name, value in self.counters.items()]
+        return '\n'.join(lines)
+
+
+@contextmanager
+def _stage(stats: CompileStats, name: str):
+    """
+    Замер этапа, если статистика собирается
+    """
+    if stats is None:
+        yield None
+    else:
+        with stats.stage(name):
+            yield stats
 
 
 # MARK: - NFMS
@@ -30,31 +90,63 @@ class FiniteStateMachineNode:
         return str(self)
 
 
+class CaptureSave:
+    """
+    Метка eps-перехода, на котором запоминается текущая позиция в слове: слот 2i -- начало группы i, 2i+1 -- конец
+    Для построения ДКА это обычный eps-переход
+    """
+
+    def __init__(self, slot: int):
+        self.slot = slot
+
+    def __str__(self):
+        return f'save{self.slot}'
+
+    def __repr__(self):
+        return str(self)
+
+
 class NKA:
     """
     Класс для НКА
+    Хранит начальное и конечное состояния фрагмента, поэтому все операции выполняются за O(1)
+    Номера новых состояний берутся из counter, общего для всех фрагментов одного построения, поэтому они
+    не зависят от других построений (в том числе параллельных)
     """
-    state_num = 0
 
-    def __init__(self, root_state: FiniteStateMachineNode = None, symbol: str = 'eps'):
+    def __init__(self, root_state: FiniteStateMachineNode = None, symbol: str = 'eps',
+                 end_state: FiniteStateMachineNode = None, counter: Iterator[int] = None):
+        """
+        :param counter: Источник номеров состояний (по умолчанию -- новый, с 1)
+        """
+        self.counter = counter if counter is not None else count(1)
         if root_state:
             self.root_state = root_state
+            self.__end_state = end_state
         else:
-            st_node = FiniteStateMachineNode(state=NKA.state_num + 1)
-            end_node = FiniteStateMachineNode(state=NKA.state_num + 2)
+            st_node = self.__new_node()
+            end_node = self.__new_node()
             st_node.outputs_append(end_node, symbol=symbol)
             self.root_state = st_node
-            NKA.state_num += 2
+            self.__end_state = end_node
+
+    def __new_node(self) -> FiniteStateMachineNode:
+        return FiniteStateMachineNode(state=next(self.counter))
+
+    def __fragment(self, root_state: FiniteStateMachineNode, end_state: FiniteStateMachineNode) -> 'NKA':
+        return NKA(root_state=root_state, end_state=end_state, counter=self.counter)
 
     def copy(self):
-        return NKA(self.root_state)
+        return self.__fragment(self.root_state, self.end_state)
 
     @property
     def end_state(self):
-        node = self.root_state
-        while not node.is_end_state:
-            node = node.outputs[0][0]
-        return node
+        if self.__end_state is None:  # Конец не передали -- ищем проходом от корня (только один раз)
+            node = self.root_state
+            while not node.is_end_state:  # Последний переход фрагмента всегда ведет вперед, к концу
+                node = node.outputs[-1][0]
+            self.__end_state = node
+        return self.__end_state
 
     def concat(self, nka):
         """
@@ -62,7 +154,7 @@ class NKA:
         """
         onode_1, onode_2 = self.copy(), nka.copy()
         onode_1.end_state.outputs_append(onode_2.root_state)
-        return NKA(root_state=onode_1.root_state)
+        return self.__fragment(onode_1.root_state, onode_2.end_state)
 
     def oorr(self, nka):
         """
@@ -71,49 +163,72 @@ class NKA:
             \\eps->(nka)-/
 
         """
-        st_node = FiniteStateMachineNode(state=NKA.state_num + 1)
-        end_node = FiniteStateMachineNode(state=NKA.state_num + 2)
+        st_node = self.__new_node()
+        end_node = self.__new_node()
         onode_1, onode_2 = self.copy(), nka.copy()
         onode_1.end_state.outputs_append(end_node)
         onode_2.end_state.outputs_append(end_node)
         st_node.outputs_append(onode_1.root_state)
         st_node.outputs_append(onode_2.root_state)
-        NKA.state_num += 2
-        return NKA(root_state=st_node)
+        return self.__fragment(st_node, end_node)
+
+    def add_alternative(self, nka):
+        """
+        Еще одна ветка в альтернативу, построенную oorr (изменяет ее):
+            //eps->(...)-\
+        (S)-|---eps->(nka)-|-eps->(F)
+        Так a|b|c|... -- одна развилка на все ветки, а не цепочка вложенных пар S/F: в цепочке из k веток
+        eps-замыкание каждого состояния содержит O(k) состояний, и их построение квадратично по k
+        """
+        onode = nka.copy()
+        self.root_state.outputs_append(onode.root_state)
+        onode.end_state.outputs_append(self.end_state)
+        return self
 
     def plus(self):
         """
             /<--------eps---------\
         (S) -eps-> (self) -eps-> (PF) -eps-> (F)
+        Переходы на повтор идут раньше выхода: так повторение жадное (важно для PikeVM, для ДКА порядок не важен)
         """
-        st_node = FiniteStateMachineNode(state=NKA.state_num + 1)
-        pre_end_node = FiniteStateMachineNode(state=NKA.state_num + 2)
-        end_node = FiniteStateMachineNode(state=NKA.state_num + 3)
+        st_node = self.__new_node()
+        pre_end_node = self.__new_node()
+        end_node = self.__new_node()
         onode = self.copy()
-        pre_end_node.outputs_append(end_node)
         pre_end_node.outputs_append(st_node)
+        pre_end_node.outputs_append(end_node)
         onode.end_state.outputs_append(pre_end_node)
         st_node.outputs_append(onode.root_state)
-        NKA.state_num += 3
-        return NKA(root_state=st_node)
+        return self.__fragment(st_node, end_node)
 
     def star(self):
         """
             /<--------eps---------\
         (S) -eps-> (self) -eps-> (PF) -eps-> (F)
             \\--------eps-------->/
+        Переходы на повтор идут раньше выхода, как в plus
         """
-        st_node = FiniteStateMachineNode(state=NKA.state_num + 1)
-        pre_end_node = FiniteStateMachineNode(state=NKA.state_num + 2)
-        end_node = FiniteStateMachineNode(state=NKA.state_num + 3)
+        st_node = self.__new_node()
+        pre_end_node = self.__new_node()
+        end_node = self.__new_node()
         onode = self.copy()
-        pre_end_node.outputs_append(end_node)
         pre_end_node.outputs_append(st_node)
+        pre_end_node.outputs_append(end_node)
         onode.end_state.outputs_append(pre_end_node)
-        st_node.outputs_append(end_node)
         st_node.outputs_append(onode.root_state)
-        NKA.state_num += 3
-        return NKA(root_state=st_node)
+        st_node.outputs_append(end_node)
+        return self.__fragment(st_node, end_node)
+
+    def capture(self, index: int):
+        """
+        (S) -save 2i-> (self) -save 2i+1-> (F)
+        """
+        st_node = self.__new_node()
+        end_node = self.__new_node()
+        onode = self.copy()
+        st_node.outputs_append(onode.root_state, symbol=CaptureSave(2 * index))
+        onode.end_state.outputs_append(end_node, symbol=CaptureSave(2 * index + 1))
+        return self.__fragment(st_node, end_node)
 
     def __get_table_row(self, alphabet: List[str]) -> Dict[str, List[str]]:
         ans = {'eps': []}
@@ -126,13 +241,13 @@ class NKA:
         Автомат в виде таблицы
         """
         ans = {}
-        already_seen = []
+        already_seen = set()
         stack = [self.root_state]
         while len(stack) > 0:
             node = stack.pop()
             if str(node.state) in already_seen:
                 continue
-            already_seen.append(str(node.state))
+            already_seen.add(str(node.state))
             for nd, sym in node.outputs:
                 stack.append(nd)
                 try:
@@ -140,23 +255,178 @@ class NKA:
                 except KeyError:
                     ans[str(node.state)] = self.__get_table_row(alphabet)
                     row = ans[str(node.state)]
-                row[sym].append(str(nd.state))
+                row['eps' if isinstance(sym, CaptureSave) else sym].append(str(nd.state))
         ans['f'] = self.__get_table_row(alphabet)
         return ans
 
+    def get_as_compact(self, alphabet: List[str], end_states: List[FiniteStateMachineNode] = None) -> 'CompactNKA':
+        """
+        Автомат в компактном виде (см. CompactNKA)
+        Состояния нумеруются в порядке обхода в ширину, начальное состояние получает номер 0
+        :param end_states: Финальные состояния (по умолчанию -- одно, end_state)
+        """
+        end_states = [self.end_state] if end_states is None else end_states
+        sym_ids = {sym: i for i, sym in enumerate(alphabet)}
+        ids = {self.root_state: 0}
+        order = [self.root_state]
+        sym_index, sym_labels, sym_targets = array('i', [0]), array('i'), array('i')
+        eps_index, eps_targets = array('i', [0]), array('i')
+        for node in order:  # order растет по ходу обхода
+            for nd, sym in node.outputs:
+                try:
+                    nd_id = ids[nd]
+                except KeyError:
+                    nd_id = ids[nd] = len(order)
+                    order.append(nd)
+                if sym == 'eps' or isinstance(sym, CaptureSave):
+                    eps_targets.append(nd_id)
+                else:
+                    sym_labels.append(sym_ids[sym])
+                    sym_targets.append(nd_id)
+            sym_index.append(len(sym_labels))
+            eps_index.append(len(eps_targets))
+        return CompactNKA(alphabet=alphabet, start=0, finals=[ids[x] for x in end_states if x in ids],
+                          sym_index=sym_index, sym_labels=sym_labels, sym_targets=sym_targets,
+                          eps_index=eps_index, eps_targets=eps_targets)
 
-def generate_nfsm_from_pregexp(pregexp: List[str], alphabet: List) -> NKA:
+
+class CompactNKA:
+    """
+    Компактное представление НКА
+    Состояния -- плотные номера 0..states_cnt-1, переходы хранятся в плоских массивах (в духе CSR):
+    переходы по символам из состояния i -- sym_labels/sym_targets[sym_index[i]:sym_index[i+1]],
+    где sym_labels -- номер символа в алфавите; eps-переходы -- eps_targets[eps_index[i]:eps_index[i+1]]
+    Финальных состояний может быть несколько (например, по одному на шаблон при объединении регулярок)
+    """
+
+    def __init__(self, alphabet: List[str], start: int, finals: List[int],
+                 sym_index: array, sym_labels: array, sym_targets: array,
+                 eps_index: array, eps_targets: array):
+        self.alphabet = alphabet
+        self.start = start
+        self.finals = finals
+        self.sym_index = sym_index
+        self.sym_labels = sym_labels
+        self.sym_targets = sym_targets
+        self.eps_index = eps_index
+        self.eps_targets = eps_targets
+        self.__closures = None
+        self.__moves = None
+
+    @property
+    def states_cnt(self) -> int:
+        return len(self.eps_index) - 1
+
+    @property
+    def final(self) -> int:
+        return self.finals[0]
+
+    @property
+    def final_mask(self) -> int:
+        return states_to_mask(self.finals)
+
+    def closure_lists(self, stats: CompileStats = None) -> List[Tuple[int, ...]]:
+        """
+        eps-замыкания всех состояний -- отсортированные кортежи номеров (считаются один раз)
+        В замыкание попадают только состояния с переходами по символам и финальные: остальные не влияют
+        ни на переходы, ни на финальность состояния ДКА. Замыкания хранятся разреженно, а не масками:
+        маска шириной во весь НКА на каждое состояние дала бы память, квадратичную по числу состояний
+        """
+        if self.__closures is None:
+            self.__closures = []
+            important = [self.sym_index[i] != self.sym_index[i + 1] for i in range(self.states_cnt)]
+            for final in self.finals:
+                important[final] = True
+            eps_edges = 0
+            for state in range(self.states_cnt):
+                closure = {state}
+                stack = [state]
+                while len(stack) > 0:
+                    cur_state = stack.pop()
+                    outputs = self.eps_outputs(cur_state)
+                    eps_edges += len(outputs)
+                    for to_ext in outputs:
+                        if to_ext not in closure:
+                            closure.add(to_ext)
+                            stack.append(to_ext)
+                self.__closures.append(tuple(sorted(x for x in closure if important[x])))
+            if stats is not None:
+                stats.count('eps_closures', self.states_cnt)
+                stats.count('eps_edges', eps_edges)
+        return self.__closures
+
+    def move_lists(self, stats: CompileStats = None) -> List[List[Tuple[int, Tuple[int, ...]]]]:
+        """
+        Для каждого состояния -- список (номер символа, состояния), где состояния -- отсортированный кортеж
+        eps-замыкания множества состояний, достижимых из данного по этому символу
+        """
+        if self.__moves is None:
+            closures = self.closure_lists(stats)
+            self.__moves = []
+            for state in range(self.states_cnt):
+                by_sym = {}
+                for i in range(self.sym_index[state], self.sym_index[state + 1]):
+                    sym_id = self.sym_labels[i]
+                    closure = closures[self.sym_targets[i]]
+                    prev = by_sym.get(sym_id)
+                    # Обычно переход по символу один, и кортеж замыкания используется без копии
+                    by_sym[sym_id] = closure if prev is None else tuple(sorted(set(prev).union(closure)))
+                self.__moves.append(list(by_sym.items()))
+        return self.__moves
+
+    def eps_outputs(self, state: int) -> array:
+        return self.eps_targets[self.eps_index[state]:self.eps_index[state + 1]]
+
+    def sym_outputs(self, state: int, sym_id: int) -> List[int]:
+        lo, hi = self.sym_index[state], self.sym_index[state + 1]
+        return [self.sym_targets[i] for i in range(lo, hi) if self.sym_labels[i] == sym_id]
+
+
+def states_to_mask(states: Iterable[int]) -> int:
+    """
+    Множество номеров состояний -> битовая маска (бит i выставлен, если состояние i в множестве)
+    Ширина маски -- до старшего состояния множества, а не до размера всего НКА
+    """
+    mask = 0
+    for state in states:
+        mask |= 1 << state
+    return mask
+
+
+def mask_to_states(mask: int) -> List[int]:
+    """
+    Битовая маска -> список номеров состояний по возрастанию
+    """
+    bits = bin(mask)[:1:-1]  # Младший бит первым
+    ans = []
+    i = bits.find('1')
+    while i != -1:
+        ans.append(i)
+        i = bits.find('1', i + 1)
+    return ans
+
+
+def generate_nfsm_from_pregexp(pregexp: Union[List[RegexpToken], RegexpNode], alphabet: List,
+                               symbol_map: Dict[str, str] = None, captures: bool = False) -> NKA:
     """
     Генерация НКА из постфиксной регулярки
     :param alphabet: Допустимый алфавит
-    :param pregexp: Постфиксная регулярка
+    :param pregexp: Постфиксная регулярка или синтаксическое дерево (результат parse_regexp)
+    :param symbol_map: Замена символов на представителей их классов эквивалентности (см. symbol_classes)
+    :param captures: Обернуть скобки в переходы CaptureSave (только для синтаксического дерева, см. PikeVM)
     :return: Начальное состояние НКА
     """
+    alphabet_set = set(alphabet)
+    counter = count(1)
     stack = []
-    while len(pregexp) > 0:
-        cur_symbol = pregexp.pop(0)
-        if cur_symbol in alphabet:
-            stack.append(NKA(symbol=cur_symbol))
+    alternatives = set()  # Фрагменты, построенные oorr здесь и еще ничем не обернутые
+    tokens = iter_postfix(pregexp, captures=True) if captures and isinstance(pregexp, RegexpNode) \
+        else __postfix_tokens(pregexp)
+    for cur_symbol in tokens:
+        if isinstance(cur_symbol, CaptureGroup):
+            stack.append(stack.pop().capture(cur_symbol.index))
+        elif isinstance(cur_symbol, SymbolClass):
+            stack.append(__nka_for_symbol_class(cur_symbol, alphabet, symbol_map, counter))
         elif cur_symbol == '.':
             nka2 = stack.pop()
             nka1 = stack.pop()
@@ -165,7 +435,11 @@ def generate_nfsm_from_pregexp(pregexp: List[str], alphabet: List) -> NKA:
         elif cur_symbol == '|':
             nka2 = stack.pop()
             nka1 = stack.pop()
-            new_nka = nka1.oorr(nka2)
+            if nka1 in alternatives:  # a|b|c в постфиксе -- ab|c|: c добавляется в развилку a|b
+                new_nka = nka1.add_alternative(nka2)
+            else:
+                new_nka = nka1.oorr(nka2)
+                alternatives.add(new_nka)
             stack.append(new_nka)
         elif cur_symbol == '*':
             nka = stack.pop()
@@ -175,29 +449,116 @@ def generate_nfsm_from_pregexp(pregexp: List[str], alphabet: List) -> NKA:
             nka = stack.pop()
             new_nka = nka.plus()
             stack.append(new_nka)
+        elif cur_symbol in alphabet_set:
+            stack.append(NKA(symbol=symbol_map[cur_symbol] if symbol_map else cur_symbol, counter=counter))
     start_node = FiniteStateMachineNode(state='s')
     end_node = FiniteStateMachineNode(state='f')
     nka = stack.pop()
     nka.end_state.outputs_append(end_node)
     start_node.outputs_append(nka.root_state)
-    return NKA(root_state=start_node)
-
-
-def draw_nka_gz(nka: NKA):
-    d = Digraph()
-    stack = [nka.root_state]
-    already_was = []
-    while len(stack) > 0:
-        node = stack.pop()
-        if node.state in already_was:
-            continue
-        already_was.append(node.state)
-        for tpl in node.outputs:
-            d.edge(f'{node.state}', f'{tpl[0].state}', label=tpl[1])
-            stack.append(tpl[0])
-    with open('nka', 'w') as f:
-        f.write(d.source)
-    d.render('nka', view=True)
+    return NKA(root_state=start_node, end_state=end_node, counter=counter)
+
+
+def __postfix_tokens(pregexp: Union[List[RegexpToken], RegexpNode]) -> Iterable[RegexpToken]:
+    return iter_postfix(pregexp) if isinstance(pregexp, RegexpNode) else pregexp
+
+
+def __nka_for_symbol_class(symbol_class: SymbolClass, alphabet: List[str], symbol_map: Dict[str, str] = None,
+                           counter: Iterator[int] = None) -> NKA:
+    """
+    НКА для класса символов: из начального состояния в конечное ведет по переходу на каждый символ класса
+    (с symbol_map -- на каждого представителя, символы одного класса эквивалентности дают один переход)
+    """
+    labels = []
+    for sym in alphabet:
+        if sym in symbol_class.symbols:
+            label = symbol_map[sym] if symbol_map else sym
+            if label not in labels:
+                labels.append(label)
+    if len(labels) == 0:
+        raise ValueError(f'В классе {symbol_class} нет символов алфавита')
+    nka = NKA(symbol=labels[0], counter=counter)
+    for label in labels[1:]:
+        nka.root_state.outputs_append(nka.end_state, symbol=label)
+    return nka
+
+
+def symbol_classes(pregexp: Union[List[RegexpToken], RegexpNode], alphabet: List[str]) -> Dict[str, str]:
+    """
+    Сжатие алфавита: символы, которые входят в одни и те же операнды регулярки, ведут себя одинаково
+    во всех автоматах для нее, поэтому их можно заменить одним представителем (первым в алфавите)
+    :param pregexp: Постфиксная регулярка или синтаксическое дерево
+    :param alphabet: Допустимый алфавит
+    :return: Символ -> представитель его класса эквивалентности
+    """
+    signatures = {sym: [] for sym in alphabet}
+    # Операции в постфиксной записи -- не операнды, даже если такой символ есть в алфавите (как в BYTE_ALPHABET)
+    operands = dict.fromkeys(x for x in __postfix_tokens(pregexp)
+                             if is_operand(x) and (isinstance(x, SymbolClass) or x in signatures))
+    for operand_id, operand in enumerate(operands):
+        for sym in operand.symbols if isinstance(operand, SymbolClass) else (operand, ):
+            if sym in signatures:
+                signatures[sym].append(operand_id)
+    representatives = {}
+    return {sym: representatives.setdefault(tuple(signatures[sym]), sym) for sym in alphabet}
+
+
+def draw_nka_gz(nka: NKA, filename: str = 'nka', render: bool = True, view: bool = True, max_states: int = None):
+    """
+    Запись НКА в DOT-файл filename (см. write_dot) и, если нужно, отрисовка через Graphviz
+    """
+    order, ids = [nka.root_state], {nka.root_state}
+    for node in order:  # order растет по ходу обхода
+        for nd, _ in node.outputs:
+            if nd not in ids:
+                ids.add(nd)
+                order.append(nd)
+    end_state = nka.end_state
+    states = [(str(node.state), node is end_state, [(str(nd.state), str(sym)) for nd, sym in node.outputs])
+              for node in order]
+    write_dot(filename, states, max_states)
+    if render:
+        Source.from_file(filename).render(view=view)
+
+
+def write_dot(path: str, states: List[Tuple[str, bool, List[Tuple[str, str]]]], max_states: int = None) -> int:
+    """
+    Потоковая запись автомата в DOT-файл: строки пишутся сразу, без построения графа в памяти, параллельные
+    переходы склеиваются в одно ребро с перечнем символов. Если состояний больше max_states, записываются первые
+    max_states, а переходы в остальные ведут в одну вершину-сводку
+    :param path: Путь к файлу
+    :param states: (имя, финальное ли, переходы (куда, символ)), первым -- начальное состояние
+    :param max_states: Максимум состояний в файле (None -- без ограничения)
+    :return: Число записанных состояний
+    """
+    shown_cnt = len(states) if max_states is None else min(len(states), max_states)
+    shown = {name for name, _, _ in states[:shown_cnt]}
+    hidden_name = f'... еще {len(states) - shown_cnt} состояний'
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('digraph {\n\trankdir=LR\n\tnode [shape=circle]\n')
+        for name, is_final, outputs in states[:shown_cnt]:
+            if is_final:
+                f.write(f'\t{__dot_id(name)} [shape=doublecircle]\n')
+            labels_by_target = {}
+            for to_name, sym in outputs:
+                labels_by_target.setdefault(to_name if to_name in shown else hidden_name, []).append(sym)
+            for to_name, labels in labels_by_target.items():
+                f.write(f'\t{__dot_id(name)} -> {__dot_id(to_name)} [label={__dot_id(__edge_label(labels))}]\n')
+        if shown_cnt < len(states):
+            f.write(f'\t{__dot_id(hidden_name)} [shape=note]\n')
+        f.write('}\n')
+    return shown_cnt
+
+
+def __edge_label(labels: List[str], max_labels: int = 8) -> str:
+    if len(labels) > max_labels:
+        return ','.join(labels[:max_labels]) + f',... ({len(labels)})'
+    return ','.join(labels)
+
+
+def __dot_id(text: str) -> str:
+    text = ''.join(x if x.isprintable() else repr(x)[1:-1] for x in text)
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
 
 
 # MARK: - DFMS
@@ -207,10 +568,10 @@ class DFSMState:
     Класс для состояния ДКА
     """
 
-    def __init__(self, state: str, nka_states: Set[str], outputs: List[Tuple[str, str]] = None, is_final=False):
+    def __init__(self, state: str, nka_states: int, outputs: List[Tuple[str, str]] = None, is_final=False):
         """
         :param state: Состояние
-        :param nka_states: Множество состояний НКА, соответствующих данному состоянию ДКА
+        :param nka_states: Битовая маска состояний НКА, соответствующих данному состоянию ДКА
         :param outputs: Переходы в другие состояния в формате (state, symbol)
         :param is_final: Является ли состояние финальным
         """
@@ -234,107 +595,162 @@ class DFSMState:
         return self.nka_states == other.nka_states
 
     def __hash__(self):
-        return hash(frozenset(self.nka_states))
+        return hash(self.nka_states)
 
 
-def generate_dfsm_from_nfsm(nfsm: Dict[str, Dict[str, List[str]]], alphabet: List[str]) -> List[DFSMState]:
+def generate_dfsm_from_nfsm(nfsm: CompactNKA, alphabet: List[str], stats: CompileStats = None) -> List[DFSMState]:
     """
-    Преобразование НКА (табличного представления) в ДКА (по сути тоже в табличное) по алгоритму из Ульмана
+    Преобразование НКА (компактного представления) в ДКА (по сути в табличное) по алгоритму из Ульмана
     :param nfsm: НКА
     :param alphabet: Допустимый алфавит
     :return: ДКА
     """
-    ans = []
-    __ec = __eps_closure_for_nka_state(nfsm, 's')
-    stack = [DFSMState('s', __ec, is_final='f' in __ec)]
-    marked_states = [(stack[0].nka_states, 's')]
-    states_cnt = 1
-    while len(stack) > 0:
-        dstate = stack.pop()
-        for asymbol in alphabet:
-            move_by_asymbol = __move_closure_for_set_of_nka_states(nfsm, dstate.nka_states, asymbol)
-            u = __eps_closure_for_set_of_nka_states(nfsm, move_by_asymbol)
-            new_dstate = DFSMState(state=str(states_cnt), nka_states=u, is_final='f' in u)
-            if new_dstate not in ans and new_dstate not in stack:
-                stack.append(new_dstate)
-                states_cnt += 1
-                marked_states.append((new_dstate.nka_states, new_dstate.state))
-            dstate.append_output(state=[x[1] for x in marked_states if x[0] == u][0], symbol=asymbol)
-        ans.append(dstate)
-    return __remove_states_without_inputs(ans)
-
-
-def __remove_states_without_inputs(dka: List[DFSMState]) -> List[DFSMState]:
-    seen_in_output = {'s', 'sf'}
-    for state in dka:
-        for ostate, _ in state.outputs:
-            seen_in_output.add(ostate)
-    ans = []
-    for state in dka:
-        if state.state in seen_in_output:
-            ans.append(state)
-    return ans
+    masks, transitions = subset_construction(nfsm, len(alphabet), stats)
+    return __dfsm_from_subsets(masks, transitions, nfsm.final_mask, alphabet)
 
 
-def __eps_closure_for_nka_state(nfsm, state: str) -> Set[str]:
+def __dfsm_from_subsets(masks: List[int], transitions: List[List[int]], final_mask: int,
+                        alphabet: List[str]) -> List[DFSMState]:
     """
-    Поиск эпсилон-замыкания из множества state
-    :param nfsm: НКА
-    :param state: Состояние
-    :return: Множество состояний, достижимых из данного только по eps-переходам
-    """
-    ans = {state}
-    stack = [state]
-    was_seen = []
-    while len(stack) > 0:
-        cur_state = stack.pop()
-        if cur_state in was_seen:
-            continue
-        was_seen.append(cur_state)
-        ans.add(state)
-        to_ext = nfsm[cur_state]['eps']
-        ans.update(to_ext)
-        stack.extend(to_ext)
-    return ans
+    Состояния ДКА по результату построения подмножеств: 's' -- начальное, остальные нумеруются по порядку
+    """
+    ans = [DFSMState(state=str(i) if i > 0 else 's', nka_states=mask, is_final=bool(mask & final_mask))
+           for i, mask in enumerate(masks)]
+    for dstate, row in zip(ans, transitions):
+        for sym_id, to_state in enumerate(row):
+            dstate.append_output(state=ans[to_state].state, symbol=alphabet[sym_id])
+    return __remove_states_without_inputs(ans)
 
 
-def __eps_closure_for_set_of_nka_states(nfsm, states) -> Set[str]:
+def subset_construction(nfsm: CompactNKA, syms_cnt: int,
+                        stats: CompileStats = None) -> Tuple[List[int], List[List[int]]]:
     """
-    Поиск эпсилон-замыкания из множества состояний states
+    Построение подмножеств над номерами: eps-замыкание и переход по символу для каждого состояния НКА
+    посчитаны заранее (разреженно, кортежами номеров) и объединяются, состояния ДКА ищутся по словарю
     :param nfsm: НКА
-    :param states: Состояния
-    :return: Множество состояний, достижимых из данного множества состояний только по eps-переходам
+    :param syms_cnt: Размер алфавита
+    :return: Маски состояний ДКА (0 -- начальное, дальше в порядке появления) и таблица переходов между ними
     """
-    ans = set()
-    for state in states:
-        eps_closure_for_state = __eps_closure_for_nka_state(nfsm, state)
-        ans.update(eps_closure_for_state)
-    return ans
+    with _stage(stats, 'eps_closures'):
+        start_states = nfsm.closure_lists(stats)[nfsm.start]
+        moves = nfsm.move_lists(stats)
+    return subset_construction_by_moves(start_states, moves, syms_cnt, stats)
 
 
-def __move_closure_for_nka_state(nfsm, state: str, symbol: str) -> Set[str]:
+def subset_construction_by_moves(start_states: Iterable[int], moves: List[List[Tuple[int, Tuple[int, ...]]]],
+                                 syms_cnt: int, stats: CompileStats = None) -> Tuple[List[int], List[List[int]]]:
     """
-    Поиск состояний, напрямую достижимых из данного по символу
-    :param nfsm: НКА
-    :param state: Состояние
-    :param symbol: Символ
-    :return: Множество состояний, достижимых из данного по символу symbol
+    Построение подмножеств по готовым переходам: moves[state] -- пары (номер символа, отсортированный кортеж
+    состояний, куда ведет переход по нему вместе с eps-замыканием)
+    Состояние ДКА ищется по кортежу своих состояний НКА, битовая маска строится только для нового состояния
     """
-    return set(nfsm[state][symbol])
-
-
-def __move_closure_for_set_of_nka_states(nfsm, states, symbol: str) -> Set[str]:
+    with _stage(stats, 'subsets'):
+        start_key = tuple(start_states)
+        members = [start_key]
+        masks = [states_to_mask(start_key)]
+        transitions = [None]
+        index = {start_key: 0}
+        stack = [0]
+        while len(stack) > 0:
+            dstate = stack.pop()
+            move_by_symbols = [[] for _ in range(syms_cnt)]
+            for nka_state in members[dstate]:
+                for sym_id, states in moves[nka_state]:
+                    move_by_symbols[sym_id].append(states)
+            row = []
+            for move in move_by_symbols:
+                # Переход из одного состояния НКА -- уже готовый ключ, объединять нужно только несколько
+                key = move[0] if len(move) == 1 else tuple(sorted(set().union(*move)))
+                try:
+                    to_state = index[key]
+                except KeyError:
+                    to_state = index[key] = len(masks)
+                    members.append(key)
+                    masks.append(states_to_mask(key))
+                    transitions.append(None)
+                    stack.append(to_state)
+                row.append(to_state)
+            transitions[dstate] = row
+    if stats is not None:
+        stats.count('dka_states', len(masks))
+    return masks, transitions
+
+
+def generate_dfsm_from_pregexp(pregexp: Union[List[RegexpToken], RegexpNode], alphabet: List[str],
+                               symbol_map: Dict[str, str] = None, stats: CompileStats = None) -> List[DFSMState]:
     """
-    Поиск состояний, напрямую достижимых из данного множества по символу
-    :param nfsm: НКА
-    :param states: Состояния
-    :param symbol: Символ
-    :return: Множество состояний, достижимых из данного множества состояний по символу symbol
+    Построение ДКА сразу по регулярке, без НКА (Ахо, Сети, Ульман: nullable, firstpos, lastpos, followpos)
+    Позиции -- вхождения операндов в регулярку плюс концевой маркер; состояние ДКА -- множество позиций (битовая
+    маска), переход по символу -- объединение followpos позиций с этим символом
+    :param pregexp: Постфиксная регулярка или синтаксическое дерево
+    :param alphabet: Допустимый алфавит
+    :param symbol_map: Замена символов на представителей их классов эквивалентности (см. symbol_classes)
+    :param stats: Сбор статистики (этапы followpos и subsets)
+    :return: ДКА над алфавитом представителей (над alphabet, если symbol_map не задан)
     """
-    ans = set()
-    for state in states:
-        cur_move_closure = __move_closure_for_nka_state(nfsm, state, symbol)
-        ans.update(cur_move_closure)
+    with _stage(stats, 'followpos'):
+        labels = list(dict.fromkeys(symbol_map[x] for x in alphabet)) if symbol_map else list(alphabet)
+        label_ids = {label: i for i, label in enumerate(labels)}
+        alphabet_set = set(alphabet)
+        positions = []  # Номера символов каждой позиции
+        followpos = []
+        stack = []  # (nullable, firstpos, lastpos) поддеревьев, множества позиций -- маски
+        for cur_symbol in __postfix_tokens(pregexp):
+            if isinstance(cur_symbol, SymbolClass) or cur_symbol not in ('.', '|', '*', '+'):
+                if isinstance(cur_symbol, SymbolClass):
+                    syms = [x for x in alphabet if x in cur_symbol.symbols]
+                    if len(syms) == 0:
+                        raise ValueError(f'В классе {cur_symbol} нет символов алфавита')
+                elif cur_symbol in alphabet_set:
+                    syms = [cur_symbol]
+                else:
+                    continue
+                positions.append(list(dict.fromkeys(label_ids[symbol_map[x] if symbol_map else x] for x in syms)))
+                followpos.append(0)
+                pos_mask = 1 << (len(positions) - 1)
+                stack.append((False, pos_mask, pos_mask))
+            elif cur_symbol == '.':
+                nullable2, first2, last2 = stack.pop()
+                nullable1, first1, last1 = stack.pop()
+                for pos in mask_to_states(last1):
+                    followpos[pos] |= first2
+                stack.append((nullable1 and nullable2, first1 | first2 if nullable1 else first1,
+                              last1 | last2 if nullable2 else last2))
+            elif cur_symbol == '|':
+                nullable2, first2, last2 = stack.pop()
+                nullable1, first1, last1 = stack.pop()
+                stack.append((nullable1 or nullable2, first1 | first2, last1 | last2))
+            else:
+                nullable, first, last = stack.pop()
+                for pos in mask_to_states(last):
+                    followpos[pos] |= first
+                stack.append((nullable or cur_symbol == '*', first, last))
+        # Конкатенация с концевым маркером: он следует за lastpos всей регулярки, финальны состояния с маркером
+        nullable, first, last = stack.pop()
+        end_mask = 1 << len(positions)
+        for pos in mask_to_states(last):
+            followpos[pos] |= end_mask
+        start_states = mask_to_states(first | end_mask if nullable else first)
+        moves = []
+        for pos, syms in enumerate(positions):
+            follow = tuple(mask_to_states(followpos[pos]))
+            moves.append([(sym_id, follow) for sym_id in syms])
+        moves.append([])  # Из концевого маркера переходов нет
+    if stats is not None:
+        stats.count('nka_states', len(positions) + 1)  # Позиции с концевым маркером -- состояния автомата Глушкова
+    masks, transitions = subset_construction_by_moves(start_states, moves, len(labels), stats)
+    return __dfsm_from_subsets(masks, transitions, end_mask, labels)
+
+
+def __remove_states_without_inputs(dka: List[DFSMState]) -> List[DFSMState]:
+    seen_in_output = {'s', 'sf'}
+    for state in dka:
+        for ostate, _ in state.outputs:
+            seen_in_output.add(ostate)
+    ans = []
+    for state in dka:
+        if state.state in seen_in_output:
+            ans.append(state)
     return ans
 
 
@@ -345,17 +761,20 @@ class MinDFSMState:
     Класс для состояния минимального ДКА
     """
 
-    def __init__(self, state: str, dka_states: Set[DFSMState], outputs: List[Tuple[str, str]] = None, is_final=False):
+    def __init__(self, state: str, dka_states: Set[DFSMState], outputs: List[Tuple[str, str]] = None, is_final=False,
+                 tags: FrozenSet[int] = frozenset()):
         """
         :param state: Состояние
         :param dka_states: Множество состояний ДКА, соответствующих данному состоянию минимального ДКА
         :param outputs: Переходы в другие состояния в формате (state, symbol)
         :param is_final: Является ли состояние финальным
+        :param tags: Номера шаблонов, которые допускаются в этом состоянии (для автомата из нескольких регулярок)
         """
         self.state = state
         self.dka_states = dka_states
         self.outputs = outputs or []
         self.is_final = is_final
+        self.tags = tags
         if is_final:
             self.state += 'f'
 
@@ -386,23 +805,36 @@ class MinDFSMState:
         return str(self)
 
     def __eq__(self, other):
+        if len(self.dka_states) == 0 and len(other.dka_states) == 0:  # Состояние построено не из ДКА (загружено и т.п.)
+            return self.state == other.state
         return self.dka_states == other.dka_states
 
     def __hash__(self):
+        if len(self.dka_states) == 0:
+            return hash(self.state)
         return hash(frozenset(self.dka_states))
 
 
-def generate_min_dka_from_dka(dka: List[DFSMState], alphabet: List[str]) -> List[MinDFSMState]:
+def generate_min_dka_from_dka(dka: List[DFSMState], alphabet: List[str],
+                              stats: CompileStats = None) -> List[MinDFSMState]:
     """
     Генерация минимального ДКА из ДКА
     :param dka: ДКА
     :param alphabet: Допустимый алфавит
+    :param stats: Сбор статистики (этапы hopcroft и min_dka)
     :return: Минимальный ДКА
     """
     # Применение алгоритма Хопкрофта
-    new_states_sets = __hopcroft_main_job(dka, alphabet)
+    with _stage(stats, 'hopcroft'):
+        new_states_sets = __hopcroft_main_job(dka, alphabet, stats)
+    with _stage(stats, 'min_dka'):
+        return __min_dka_from_partition(new_states_sets)
+
+
+def __min_dka_from_partition(new_states_sets: List[Set[DFSMState]]) -> List[MinDFSMState]:
     # Создание состояний минимального ДКА без переходов
     new_states = []
+    min_state_by_dka_state = {}
     for i, states_set in enumerate(new_states_sets):
         dka_states_set = set([x for x in states_set])
         dka_states_names = set([x.state for x in states_set])
@@ -410,131 +842,223 @@ def generate_min_dka_from_dka(dka: List[DFSMState], alphabet: List[str]) -> List
         state_name = f'{i}{"s" if len(dka_states_names.intersection({"s", "sf"})) != 0 else ""}'
         new_state = MinDFSMState(state=state_name, dka_states=dka_states_set, is_final=is_final)
         new_states.append(new_state)
+        for name in dka_states_names:
+            min_state_by_dka_state[name] = new_state
     # Создание переходов
     for state in new_states:
-        outputs = __create_outputs_for_min_dka_state(new_states, state)
+        outputs = __create_outputs_for_min_dka_state(min_state_by_dka_state, state)
         state.outputs = outputs
     return new_states
 
 
-def __hopcroft_main_job(dka: List[DFSMState], alphabet: List[str]) -> List[Set[DFSMState]]:
+def hopcroft_partition(transitions: List[List[int]], labels: List, stats: CompileStats = None) -> List[int]:
     """
-    Функция алгоритма Хопкрофта
+    Разбиение состояний полного ДКА на классы эквивалентности алгоритмом Хопкрофта за O(n * |Σ| * log n)
+    Используется обратный индекс переходов, номера блоков у каждого состояния и множество-очередь блоков;
+    при расщеплении в новый блок всегда уходит меньшая часть
+    :param transitions: transitions[state][sym_id] -- номер состояния, в которое ведет переход
+    :param labels: Метки состояний (например, финальность); состояния с разными метками не эквивалентны
+    :param stats: Сбор статистики (счетчик partition_splits)
+    :return: Номер блока для каждого состояния, блоки пронумерованы в порядке первого появления
     """
-    fins, non_fins = __find_finals_and_rest(dka)
-    w = [fins]
-    p = [fins]
-    if len(non_fins) != 0:  # Может быть такое, что все состояния ДКА -- финальные, и пустого множества нам не надо
-        w.append(non_fins)
-        p.append(non_fins)
-    while len(w) > 0:
-        s = w.pop(0)
-        for asym in alphabet:
-            inputs = __find_all_inputs_for_states(dka, s, asym)
-            for r in p:
-                if len(r.intersection(inputs)) == 0 or r.issubset(inputs):
+    states_cnt = len(transitions)
+    syms_cnt = len(transitions[0]) if states_cnt > 0 else 0
+    inverse = [[[] for _ in range(states_cnt)] for _ in range(syms_cnt)]
+    for state, row in enumerate(transitions):
+        for sym_id, to_state in enumerate(row):
+            inverse[sym_id][to_state].append(state)
+    # Начальное разбиение -- по меткам
+    blocks = []
+    block_of = [0] * states_cnt
+    block_by_label = {}
+    for state, label in enumerate(labels):
+        try:
+            block_id = block_by_label[label]
+        except KeyError:
+            block_id = block_by_label[label] = len(blocks)
+            blocks.append(set())
+        blocks[block_id].add(state)
+        block_of[state] = block_id
+    waiting = set(range(len(blocks)))
+    splits = 0
+    while len(waiting) > 0:
+        splitter = list(blocks[waiting.pop()])
+        for sym_inverse in inverse:
+            touched = {}
+            for to_state in splitter:
+                for state in sym_inverse[to_state]:
+                    touched.setdefault(block_of[state], []).append(state)
+            for block_id, part in touched.items():
+                block = blocks[block_id]
+                if len(part) == len(block):
                     continue
-                r1 = r.intersection(inputs)
-                r2 = r.difference(r1)
-                p.remove(r)
-                p.append(r1)
-                p.append(r2)
-                if r in w:
-                    w.remove(r)
-                    w.append(r1)
-                    w.append(r2)
-                else:
-                    r_min = r1 if len(r1) < len(r2) else r2
-                    w.append(r_min)
-    return p
-
-
-def __find_finals_and_rest(dka: Iterable[DFSMState]) -> Tuple[Set[DFSMState], Set[DFSMState]]:
-    """
-    Поиск всех финальных и нефинальных состояний ДКА
-    :param dka: ДКА
-    :return: Списки финальных и нефинальных состояний
-    """
-    fin = set()
-    non_fin = set()
-    for state in dka:
-        if state.is_final:
-            fin.add(state)
-        else:
-            non_fin.add(state)
-    return fin, non_fin
-
-
-def __find_all_inputs_for_state(dka: List[DFSMState], dka_state: DFSMState, sym: str) -> Set[DFSMState]:
+                moved = set(part) if 2 * len(part) <= len(block) else block.difference(part)
+                block.difference_update(moved)
+                new_block_id = len(blocks)
+                blocks.append(moved)
+                for state in moved:
+                    block_of[state] = new_block_id
+                # Если block уже ждет обработки, то нужны обе части; иначе достаточно меньшей -- она и есть moved
+                waiting.add(new_block_id)
+                splits += 1
+    if stats is not None:
+        stats.count('partition_splits', splits)
+    # Перенумерация блоков в порядке первого появления
+    renumber = {}
+    return [renumber.setdefault(block_id, len(renumber)) for block_id in block_of]
+
+
+def __hopcroft_main_job(dka: List[DFSMState], alphabet: List[str], stats: CompileStats = None) -> List[Set[DFSMState]]:
     """
-    Поиск состояний, входящих в данное
-    :param dka: ДКА
-    :param dka_state: Состояние, входы в которое мы ищем
-    :param sym: По данному символу
-    :return: Названия входящих состояний
+    Функция алгоритма Хопкрофта
     """
-    ans = set()
+    index = {state.state: i for i, state in enumerate(dka)}
+    sym_ids = {sym: i for i, sym in enumerate(alphabet)}
+    transitions = []
     for state in dka:
-        if (dka_state.state, sym) in state.outputs:
-            ans.add(state)
-    return ans
-
-
-def __find_all_inputs_for_states(dka: List[DFSMState], dka_states: Iterable[DFSMState], sym: str) -> Set[DFSMState]:
-    """
-    То же самое, но для множества состояний
-    """
-    ans = set()
-    for state in dka_states:
-        ans.update(__find_all_inputs_for_state(dka, state, sym))
-    return ans
+        row = [0] * len(alphabet)
+        for ostate, sym in state.outputs:
+            row[sym_ids[sym]] = index[ostate]
+        transitions.append(row)
+    block_of = hopcroft_partition(transitions, [state.is_final for state in dka], stats)
+    p = [set() for _ in range(max(block_of, default=-1) + 1)]
+    for state, block_id in zip(dka, block_of):
+        p[block_id].add(state)
+    return p
 
 
-def __create_outputs_for_min_dka_state(min_dka: List[MinDFSMState], state: MinDFSMState) -> List[Tuple[str, str]]:
+def __create_outputs_for_min_dka_state(min_state_by_dka_state: Dict[str, MinDFSMState],
+                                       state: MinDFSMState) -> List[Tuple[str, str]]:
     """
     Создание списка выходов для состояния минимального ДКА
     """
     outputs = []
     dka_outputs = next(iter(state.dka_states)).outputs
     for dka_state_name, sym in dka_outputs:
-        state_to_go = [x for x in min_dka if dka_state_name in x.dka_states_names][0]
-        outputs.append((state_to_go.state, sym))
+        outputs.append((min_state_by_dka_state[dka_state_name].state, sym))
     return outputs
 
 
-def draw_dka_gz(dka: Union[List[DFSMState], List[MinDFSMState]], is_min=False):
-    d = Digraph()
-    filename = 'dka_min' if is_min else 'dka'
-    for state in dka:
-        for output_state, symbol in state.outputs:
-            d.edge(state.state, output_state, label=symbol)
-    with open(filename, 'w') as f:
-        f.write(d.source)
-    d.render(filename, view=True)
+def draw_dka_gz(dka: Union[List[DFSMState], List[MinDFSMState]], is_min=False, filename: str = None,
+                render: bool = True, view: bool = True, max_states: int = None):
+    """
+    Запись ДКА в DOT-файл (по умолчанию dka или dka_min, см. write_dot) и, если нужно, отрисовка через Graphviz
+    """
+    filename = filename or ('dka_min' if is_min else 'dka')
+    start = [x for x in dka if 's' in x.state][:1]  # Начальное состояние -- первым, чтобы оно не попало в сводку
+    order = start + [x for x in dka if x not in start]
+    write_dot(filename, [(x.state, x.is_final, x.outputs) for x in order], max_states)
+    if render:
+        Source.from_file(filename).render(view=view)
 
 
 def dka_job(dka: List[MinDFSMState], word: str) -> bool:
     """
     Функция, моделирующая КА
     """
+    states = {x.state: x for x in dka}
     cur_state = [x for x in dka if x.is_start_state()][0]
-    while len(word) > 0:
-        sym = word[0]
-        word = word[1:]
+    for sym in word:
         try:
             state_to_go = [x[0] for x in cur_state.outputs if x[1] == sym][0]
         except IndexError:
             raise ValueError(f'Символа {sym} нет в допустимом алфавите!')
-        cur_state = [x for x in dka if x.state == state_to_go][0]
+        cur_state = states[state_to_go]
     return cur_state.is_final
 
 
+def dka_job_batch(dka: List[MinDFSMState], words: List[str]):
+    """
+    Пакетная проверка слов на NumPy: слова упаковываются в матрицу номеров символов, дополненную
+    фиктивным символом (переход по нему не меняет состояние), и все слова сдвигаются на символ за шаг
+    :param dka: Минимальный ДКА
+    :param words: Слова
+    :return: numpy-массив bool, i-й элемент -- допускает ли автомат i-е слово
+    """
+    import numpy as np  # Необязательная зависимость, нужна только здесь
+
+    index = {x.state: i for i, x in enumerate(dka)}
+    alphabet = list(dict.fromkeys(sym for state in dka for _, sym in state.outputs))
+    sym_ids = {sym: i for i, sym in enumerate(alphabet)}
+    pad = len(alphabet)
+    table = np.empty((len(dka), len(alphabet) + 1), dtype=np.int32)
+    table[:, pad] = np.arange(len(dka), dtype=np.int32)
+    for i, state in enumerate(dka):
+        for ostate, sym in state.outputs:
+            table[i, sym_ids[sym]] = index[ostate]
+    finals = np.array([x.is_final for x in dka], dtype=bool)
+    start = [i for i, x in enumerate(dka) if x.is_start_state()][0]
+
+    # Матрица символов хранится транспонированной (строка -- позиция в слове), чтобы шаг читал непрерывный кусок
+    width = len(alphabet) + 1
+    lens = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    max_len = int(lens.max()) if len(words) > 0 else 0
+    codes = np.full((max_len, len(words)), pad, dtype=np.int32)
+    if max_len > 0:
+        points = np.frombuffer(''.join(words).encode('utf-32-le'), dtype=np.uint32)
+        lut = np.full(max(int(points.max()), max(ord(x) for x in alphabet)) + 1, -1, dtype=np.int32)
+        for sym_id, sym in enumerate(alphabet):
+            lut[ord(sym)] = sym_id
+        points_ids = lut[points]
+        if (points_ids < 0).any():
+            raise ValueError(f'Символа {chr(points[np.argmax(points_ids < 0)])} нет в допустимом алфавите!')
+        word_nums = np.repeat(np.arange(len(words)), lens)
+        positions = np.arange(len(points)) - np.repeat(np.cumsum(lens) - lens, lens)
+        codes.ravel()[positions * len(words) + word_nums] = points_ids
+
+    # Состояния хранятся сразу как смещения строк в плоской таблице переходов
+    flat_table = (table * width).ravel()
+    offsets = np.full(len(words), start * width, dtype=np.int32)
+    for j in range(max_len):
+        offsets = flat_table[offsets + codes[j]]
+    return finals[offsets // width]
+
+
 # MARK: - All in one
-def generate_min_dka_from_pregexp(pregexp, alphabet) -> List[MinDFSMState]:
+DKA_METHODS = ('thompson', 'followpos')
+
+
+def generate_min_dka_from_pregexp(pregexp, alphabet, method: str = 'thompson',
+                                  stats: CompileStats = None) -> List[MinDFSMState]:
     """
-    Получение минимального ДКА для постфиксного регекспа
+    Получение минимального ДКА для постфиксного регекспа (или синтаксического дерева)
+    НКА, ДКА и минимизация строятся над сжатым алфавитом (по символу на класс эквивалентности, см. symbol_classes),
+    переходы по всему алфавиту восстанавливаются только в минимальном ДКА
+    :param method: Построение ДКА: 'thompson' -- через НКА Томпсона и построение подмножеств,
+        'followpos' -- сразу по регулярке (generate_dfsm_from_pregexp), без промежуточного НКА
+    :param stats: Сбор времени этапов и счетчиков (см. CompileStats)
     """
-    nka = generate_nfsm_from_pregexp(pregexp, alphabet)
-    dka = generate_dfsm_from_nfsm(nka.get_as_table(alphabet), alphabet)
-    min_dka = generate_min_dka_from_dka(dka, alphabet)
+    if method not in DKA_METHODS:
+        raise ValueError(f'Неизвестный способ построения ДКА {method}, возможные: {", ".join(DKA_METHODS)}')
+    with _stage(stats, 'symbol_classes'):
+        symbol_map = symbol_classes(pregexp, alphabet)
+        classes_alphabet = list(dict.fromkeys(symbol_map.values()))
+    if method == 'followpos':
+        dka = generate_dfsm_from_pregexp(pregexp, alphabet, symbol_map, stats)
+    else:
+        with _stage(stats, 'thompson'):
+            nka = generate_nfsm_from_pregexp(pregexp, alphabet, symbol_map)
+        with _stage(stats, 'compact'):
+            compact = nka.get_as_compact(classes_alphabet)
+        if stats is not None:
+            stats.count('nka_states', compact.states_cnt)
+        dka = generate_dfsm_from_nfsm(compact, classes_alphabet, stats)
+    min_dka = generate_min_dka_from_dka(dka, classes_alphabet, stats)
+    with _stage(stats, 'expand'):
+        min_dka = expand_symbol_classes(min_dka, symbol_map, alphabet)
+    if stats is not None:
+        stats.count('min_dka_states', len(min_dka))
     return min_dka
+
+
+def expand_symbol_classes(dka: List[MinDFSMState], symbol_map: Dict[str, str],
+                          alphabet: List[str]) -> List[MinDFSMState]:
+    """
+    Переходы по представителям классов -> переходы по всем символам алфавита
+    """
+    if len(set(symbol_map.values())) == len(alphabet):
+        return dka
+    for state in dka:
+        by_representative = {sym: ostate for ostate, sym in state.outputs}
+        state.outputs = [(by_representative[symbol_map[sym]], sym) for sym in alphabet]
+    return dka
@@ -0,0 +1,133 @@
+import argparse
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Iterable, Iterator, Tuple
+from regexp_process import ALPHABETS, RegexpError
+from matcher import CompiledDKA
+from FSM import CompileStats
+from compile_cache import CompileCache
+
+
+_worker_dka: CompiledDKA = None
+
+
+def _init_worker(dka: CompiledDKA):
+    global _worker_dka
+    _worker_dka = dka
+
+
+def _match_chunk(words: List[str]) -> List[bool]:
+    """
+    Проверка части слов в процессе пула; слово с символами не из алфавита не допускается
+    """
+    try:
+        return _worker_dka.match_many(words)
+    except ValueError:
+        ans = []
+        for word in words:
+            try:
+                ans.append(_worker_dka.match(word))
+            except ValueError:
+                ans.append(False)
+        return ans
+
+
+def _chunks(words: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    chunk = []
+    for word in words:
+        chunk.append(word)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+def match_batch(dka: CompiledDKA, words: Iterable[str], jobs: int = 1,
+                chunk_size: int = 10000) -> Iterator[Tuple[str, bool]]:
+    """
+    Проверка потока слов, результаты выдаются по мере готовности в порядке слов
+    :param dka: Скомпилированный ДКА
+    :param words: Слова (читаются лениво)
+    :param jobs: Число процессов (1 -- проверка в текущем процессе)
+    :param chunk_size: Слов в одной части, отправляемой в процесс
+    :return: Пары (слово, допускается ли)
+    """
+    if jobs <= 1:
+        _init_worker(dka)
+        for chunk in _chunks(words, chunk_size):
+            yield from zip(chunk, _match_chunk(chunk))
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(dka, )) as executor:
+        pending = deque()  # Не больше 2 * jobs частей в работе, чтобы не читать весь вход в память
+        for chunk in _chunks(words, chunk_size):
+            pending.append((chunk, executor.submit(_match_chunk, chunk)))
+            if len(pending) >= 2 * jobs:
+                chunk, future = pending.popleft()
+                yield from zip(chunk, future.result())
+        while len(pending) > 0:
+            chunk, future = pending.popleft()
+            yield from zip(chunk, future.result())
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Пакетная проверка слов регуляркой: на выход идут строки '
+                                                 '"1<TAB>слово" (допускается) или "0<TAB>слово"')
+    parser.add_argument('regexp', help='Регулярка')
+    parser.add_argument('words', nargs='?', help='Файл со словами по одному в строке (по умолчанию stdin)')
+    parser.add_argument('--alphabet', choices=sorted(ALPHABETS), default='test', help='Алфавит')
+    parser.add_argument('--jobs', type=int, default=1, help='Число процессов')
+    parser.add_argument('--chunk-size', type=int, default=10000, help='Слов в одной части для процесса')
+    parser.add_argument('--cache-dir', help='Каталог кэша автоматов (см. CompileCache)')
+    parser.add_argument('--only-accepted', action='store_true', help='Выводить только допускаемые слова')
+    parser.add_argument('--stats', action='store_true', help='Время этапов построения автомата (в stderr)')
+    args = parser.parse_args(argv)
+
+    alphabet = ALPHABETS[args.alphabet]
+    st = time.perf_counter()
+    try:
+        stats = CompileStats() if args.stats else None
+        dka = CompiledDKA.from_min_dka(CompileCache(cache_dir=args.cache_dir).compile(args.regexp, alphabet, stats))
+    except RegexpError as e:
+        print(e, file=sys.stderr)
+        return 1
+    t_compile = time.perf_counter() - st
+    if stats is not None:
+        print(stats, file=sys.stderr)
+
+    try:
+        words_file = open(args.words, encoding='utf-8') if args.words else sys.stdin
+    except OSError as e:
+        print(e, file=sys.stderr)
+        return 1
+    words = (line.rstrip('\r\n') for line in words_file)
+    words_cnt, accepted_cnt, chars_cnt = 0, 0, 0
+    out = sys.stdout
+    st = time.perf_counter()
+    try:
+        for word, is_ok in match_batch(dka, words, args.jobs, args.chunk_size):
+            words_cnt += 1
+            chars_cnt += len(word)
+            accepted_cnt += is_ok
+            if is_ok:
+                out.write(f'1\t{word}\n')
+            elif not args.only_accepted:
+                out.write(f'0\t{word}\n')
+        out.flush()
+    except BrokenPipeError:  # Читатель закрыл вывод (например, head) -- это не ошибка
+        sys.stdout = None
+        return 0
+    finally:
+        if words_file is not sys.stdin:
+            words_file.close()
+    t_match = time.perf_counter() - st
+    print(f'Построение: {t_compile:.3f} с, проверка: {t_match:.3f} с; слов: {words_cnt}, допущено: {accepted_cnt}, '
+          f'{words_cnt / max(t_match, 1e-9):.0f} слов/с, {chars_cnt / max(t_match, 1e-9) / 1e6:.2f} млн симв/с',
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
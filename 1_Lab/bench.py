@@ -0,0 +1,506 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+from regexp_process import TEST_ALPHABET, BYTE_ALPHABET, LATIN_ALPHABET, get_postfix_regexp, parse_regexp
+from FSM import CompileStats, generate_nfsm_from_pregexp, generate_dfsm_from_nfsm, generate_min_dka_from_dka, \
+    generate_min_dka_from_pregexp, generate_dfsm_from_pregexp, dka_job, dka_job_batch, draw_nka_gz, draw_dka_gz
+from matcher import CompiledDKA
+from lazy_dka import LazyDKA
+from multi_dka import generate_multi_min_dka
+from lexer import Lexer
+from words_dka import WordsDKABuilder
+from compile_cache import compile_many
+from pike_vm import PikeVM
+from equivalence import find_difference
+from search import Searcher
+from codegen import compile_matcher
+
+
+BENCHMARKS: Dict[str, Callable[[List[int]], None]] = {}
+DEFAULT_SIZES = {
+    'nka': [1000, 2000, 4000, 8000, 16000],
+    'dka': [4, 6, 8, 10, 12],
+    'min_dka': [4, 6, 8, 10, 12],
+    'match': [10, 100, 1000],
+    'lazy': [8, 12, 16, 20, 24],
+    'batch': [10000, 100000, 1000000],
+    'classes': [2, 4, 6, 8],
+    'parse': [1000, 10000, 100000],
+    'multi': [10, 50, 100, 200],
+    'lexer': [10000, 100000, 1000000],
+    'followpos': [4, 8, 12, 100, 1000],
+    'words': [1000, 10000, 100000],
+    'pike': [8, 12, 16],
+    'dot': [8, 12, 16],
+    'equiv': [8, 12, 14],
+    'compile_many': [100, 1000],
+    'search': [1000, 10000, 100000, 1000000],
+    'codegen': [3, 6, 9, 12],
+    'keywords': [500, 1000, 2000, 4000],
+}
+
+
+def benchmark(name: str):
+    """
+    Регистрация бенчмарка под именем name
+    """
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def _timeit(func: Callable, *args, repeat: int = 3) -> float:
+    """
+    Лучшее время выполнения func(*args) из repeat запусков
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        st = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - st)
+    return best
+
+
+def _concat_pregexp(n: int) -> List[str]:
+    """
+    Постфиксная регулярка -- конкатенация n символов алфавита
+    """
+    pregexp = [TEST_ALPHABET[0]]
+    for i in range(1, n):
+        pregexp += [TEST_ALPHABET[i % len(TEST_ALPHABET)], '.']
+    return pregexp
+
+
+def _keywords_pregexp(n: int, keyword_len: int = 8) -> List[str]:
+    """
+    Постфиксная регулярка -- альтернатива n ключевых слов длины keyword_len
+    """
+    pregexp = []
+    for i in range(n):
+        pregexp += _concat_pregexp(keyword_len)
+        if i > 0:
+            pregexp.append('|')
+    return pregexp
+
+
+@benchmark('nka')
+def bench_nka(sizes: List[int]):
+    """
+    Построение НКА по Томпсону в зависимости от длины регулярки (время на символ должно быть постоянным)
+    """
+    print(f'{"длина":>10} {"конкатенация, с":>16} {"мкс/символ":>11} {"ключевые слова, с":>18} {"мкс/символ":>11}')
+    for n in sizes:
+        concat = _concat_pregexp(n)
+        keywords = _keywords_pregexp(n // 8)
+        t_concat = _timeit(generate_nfsm_from_pregexp, concat, TEST_ALPHABET)
+        t_keywords = _timeit(generate_nfsm_from_pregexp, keywords, TEST_ALPHABET)
+        print(f'{n:>10} {t_concat:>16.4f} {t_concat / len(concat) * 1e6:>11.3f} '
+              f'{t_keywords:>18.4f} {t_keywords / len(keywords) * 1e6:>11.3f}')
+
+
+def _nth_from_end_regexp(n: int) -> str:
+    """
+    Регулярка (a|b)*a(a|b)...(a|b) -- n-й символ с конца равен a, минимальный ДКА имеет 2^n состояний
+    """
+    return '(a|b)*a' + '(a|b)' * (n - 1)
+
+
+@benchmark('dka')
+def bench_dka(sizes: List[int]):
+    """
+    Построение ДКА из НКА для регулярок (a|b)*a(a|b){n-1}
+    """
+    print(f'{"n":>4} {"состояний ДКА":>14} {"время, с":>10}')
+    for n in sizes:
+        nka = generate_nfsm_from_pregexp(get_postfix_regexp(_nth_from_end_regexp(n)), TEST_ALPHABET)
+        compact = nka.get_as_compact(TEST_ALPHABET)
+        dka_states_cnt = len(generate_dfsm_from_nfsm(compact, TEST_ALPHABET))
+        t = _timeit(generate_dfsm_from_nfsm, compact, TEST_ALPHABET)
+        print(f'{n:>4} {dka_states_cnt:>14} {t:>10.4f}')
+
+
+@benchmark('min_dka')
+def bench_min_dka(sizes: List[int]):
+    """
+    Минимизация ДКА алгоритмом Хопкрофта для регулярок (a|b)*a(a|b){n-1}
+    """
+    print(f'{"n":>4} {"состояний ДКА":>14} {"минимальный":>12} {"время, с":>10}')
+    for n in sizes:
+        nka = generate_nfsm_from_pregexp(get_postfix_regexp(_nth_from_end_regexp(n)), TEST_ALPHABET)
+        dka = generate_dfsm_from_nfsm(nka.get_as_compact(TEST_ALPHABET), TEST_ALPHABET)
+        min_dka_states_cnt = len(generate_min_dka_from_dka(dka, TEST_ALPHABET))
+        t = _timeit(generate_min_dka_from_dka, dka, TEST_ALPHABET)
+        print(f'{n:>4} {len(dka):>14} {min_dka_states_cnt:>12} {t:>10.4f}')
+
+
+def _random_words(count: int, length: int) -> List[str]:
+    rnd = random.Random(length)
+    return [''.join(rnd.choices(TEST_ALPHABET, k=length)) for _ in range(count)]
+
+
+@benchmark('match')
+def bench_match(sizes: List[int]):
+    """
+    Проверка слов длины n минимальным ДКА для (a|b)*a(a|b)(a|b): dka_job против CompiledDKA
+    """
+    min_dka = generate_min_dka_from_pregexp(get_postfix_regexp(_nth_from_end_regexp(3)), TEST_ALPHABET)
+    compiled = CompiledDKA.from_min_dka(min_dka)
+    print(f'{"длина":>6} {"слов":>6} {"dka_job, с":>11} {"match_many, с":>14} {"млн симв/с":>11}')
+    for n in sizes:
+        words = _random_words(100000 // n, n)
+        t_job = _timeit(lambda: [dka_job(min_dka, x) for x in words], repeat=1)
+        t_compiled = _timeit(compiled.match_many, words)
+        print(f'{n:>6} {len(words):>6} {t_job:>11.4f} {t_compiled:>14.4f} '
+              f'{len(words) * n / t_compiled / 1e6:>11.2f}')
+
+
+@benchmark('lazy')
+def bench_lazy(sizes: List[int]):
+    """
+    Ленивый ДКА с кэшем на 4096 состояний для (a|b)*a(a|b){n-1}: полный ДКА имеет 2^n состояний
+    """
+    words = _random_words(100, 1000)
+    print(f'{"n":>4} {"полный ДКА":>12} {"в кэше":>7} {"сбросов":>8} {"время, с":>10}')
+    for n in sizes:
+        nka = generate_nfsm_from_pregexp(get_postfix_regexp(_nth_from_end_regexp(n)), TEST_ALPHABET)
+        lazy = LazyDKA(nka, TEST_ALPHABET, max_states=4096)
+        t = _timeit(lazy.match_many, words, repeat=1)
+        print(f'{n:>4} {2 ** n:>12} {lazy.cached_states_cnt:>7} {lazy.flushes:>8} {t:>10.4f}')
+
+
+@benchmark('batch')
+def bench_batch(sizes: List[int]):
+    """
+    Пакетная проверка n коротких слов (длины 1..16) для (a|b)*a(a|b)(a|b): CompiledDKA против NumPy
+    """
+    min_dka = generate_min_dka_from_pregexp(get_postfix_regexp(_nth_from_end_regexp(3)), TEST_ALPHABET)
+    compiled = CompiledDKA.from_min_dka(min_dka)
+    rnd = random.Random(0)
+    dka_job_batch(min_dka, ['a'])  # Импорт NumPy не должен попадать в замер
+    print(f'{"слов":>8} {"match_many, с":>14} {"dka_job_batch, с":>17}')
+    for n in sizes:
+        words = [''.join(rnd.choices(TEST_ALPHABET, k=rnd.randint(1, 16))) for _ in range(n)]
+        t_compiled = _timeit(compiled.match_many, words, repeat=1)
+        t_batch = _timeit(dka_job_batch, min_dka, words, repeat=1)
+        print(f'{n:>8} {t_compiled:>14.4f} {t_batch:>17.4f}')
+
+
+def _min_dka_without_classes(pregexp, alphabet):
+    """
+    Построение минимального ДКА по всему алфавиту, без сжатия в классы эквивалентности
+    """
+    nka = generate_nfsm_from_pregexp(pregexp, alphabet)
+    dka = generate_dfsm_from_nfsm(nka.get_as_compact(alphabet), alphabet)
+    return generate_min_dka_from_dka(dka, alphabet)
+
+
+@benchmark('classes')
+def bench_classes(sizes: List[int]):
+    """
+    Построение минимального ДКА для .*a.{n-1} над байтовым алфавитом: со сжатием алфавита и без
+    """
+    print(f'{"n":>4} {"состояний":>10} {"без сжатия, с":>14} {"со сжатием, с":>14}')
+    for n in sizes:
+        pregexp = get_postfix_regexp('.*a' + '.' * (n - 1), BYTE_ALPHABET)
+        t_full = _timeit(_min_dka_without_classes, pregexp, BYTE_ALPHABET, repeat=1)
+        t_classes = _timeit(generate_min_dka_from_pregexp, pregexp, BYTE_ALPHABET, repeat=1)
+        states_cnt = len(generate_min_dka_from_pregexp(pregexp, BYTE_ALPHABET))
+        print(f'{n:>4} {states_cnt:>10} {t_full:>14.4f} {t_classes:>14.4f}')
+
+
+@benchmark('parse')
+def bench_parse(sizes: List[int]):
+    """
+    Разбор альтернативы n ключевых слов длины 8 (в дерево и в постфиксную запись) и построение НКА по дереву
+    """
+    print(f'{"слов":>8} {"длина":>8} {"дерево, с":>10} {"постфикс, с":>12} {"НКА, с":>8} {"мкс/символ":>11}')
+    for n in sizes:
+        regexp = '|'.join(''.join(x) for x in _random_words(n, 8))
+        t_ast = _timeit(parse_regexp, regexp, repeat=1)
+        t_postfix = _timeit(get_postfix_regexp, regexp, repeat=1)
+        ast = parse_regexp(regexp)
+        t_nka = _timeit(generate_nfsm_from_pregexp, ast, TEST_ALPHABET, repeat=1)
+        print(f'{n:>8} {len(regexp):>8} {t_ast:>10.4f} {t_postfix:>12.4f} {t_nka:>8.4f} '
+              f'{t_ast / len(regexp) * 1e6:>11.3f}')
+
+
+@benchmark('multi')
+def bench_multi(sizes: List[int]):
+    """
+    n шаблонов вида (a|b)*w (w -- случайное слово длины 6): по автомату на шаблон против одного общего
+    """
+    words = _random_words(1000, 100)
+    print(f'{"шаблонов":>9} {"состояний":>10} {"построение, с":>14} {"по одному, с":>13} {"общий, с":>9}')
+    for n in sizes:
+        pregexps = [get_postfix_regexp('(a|b)*' + x) for x in _random_words(n, 6)]
+        singles = [CompiledDKA.from_min_dka(generate_min_dka_from_pregexp(x, TEST_ALPHABET)) for x in pregexps]
+        st = time.perf_counter()
+        multi_dka = generate_multi_min_dka(pregexps, TEST_ALPHABET)
+        t_build = time.perf_counter() - st
+        multi = CompiledDKA.from_min_dka(multi_dka)
+        t_singles = _timeit(lambda: [[x.match(w) for x in singles] for w in words], repeat=1)
+        t_multi = _timeit(lambda: [multi.match_tags(w) for w in words], repeat=1)
+        print(f'{n:>9} {len(multi_dka):>10} {t_build:>14.4f} {t_singles:>13.4f} {t_multi:>9.4f}')
+
+
+@benchmark('lexer')
+def bench_lexer(sizes: List[int]):
+    """
+    Разбиение на токены текста из n токенов (ключевые слова, идентификаторы, числа, операции сравнения)
+    """
+    keywords = ['if', 'then', 'else', 'while', 'do']
+    rules = [(x, x) for x in keywords] + [('id', '[a-z][a-z0-9]*'), ('num', '[0-9]+'),
+                                          ('rel', '<|<=|>|>=|<>|=='), ('ws', ' +')]
+    lexer = Lexer(rules, LATIN_ALPHABET + list('<>= '), skip=['ws'])
+    rnd = random.Random(0)
+    lexemes = keywords + ['x', 'counter1', 'iff', '0', '1234567', '<', '<=', '<>', '==']
+    # Худший случай для чтения заново от каждого токена: a*b не становится тупиковым на a...a
+    prefix_lexer = Lexer([('a', 'a'), ('ab', 'a*b')], TEST_ALPHABET)
+    print(f'{"токенов":>9} {"символов":>10} {"время, с":>10} {"млн симв/с":>11} {"a|a*b на a^n, с":>16}')
+    for n in sizes:
+        text = ' '.join(rnd.choices(lexemes, k=n))
+        t = _timeit(lambda: sum(1 for _ in lexer.tokenize(text)), repeat=1)
+        t_prefix = _timeit(lambda: sum(1 for _ in prefix_lexer.tokenize('a' * n)), repeat=1)
+        print(f'{n:>9} {len(text):>10} {t:>10.4f} {len(text) / t / 1e6:>11.2f} {t_prefix:>16.4f}')
+
+
+def _peak_memory(func: Callable, *args) -> int:
+    """
+    Пиковый объем памяти (байт), выделенной за время выполнения func(*args)
+    """
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@benchmark('followpos')
+def bench_followpos(sizes: List[int]):
+    """
+    Минимальный ДКА через НКА Томпсона против построения по followpos: (a|b)*a(a|b){n-1} для n <= 16,
+    иначе альтернатива n случайных слов длины 8
+    """
+    print(f'{"n":>6} {"состояний":>10} {"Томпсон, с":>11} {"followpos, с":>13} {"Томпсон, КБ":>12} '
+          f'{"followpos, КБ":>14}')
+    for n in sizes:
+        regexp = _nth_from_end_regexp(n) if n <= 16 else '|'.join(_random_words(n, 8))
+        pregexp = get_postfix_regexp(regexp)
+        states_cnt = len(generate_min_dka_from_pregexp(pregexp, TEST_ALPHABET, method='followpos'))
+        times, peaks = [], []
+        for method in ('thompson', 'followpos'):
+            times.append(_timeit(generate_min_dka_from_pregexp, pregexp, TEST_ALPHABET, method, repeat=1))
+            peaks.append(_peak_memory(generate_min_dka_from_pregexp, pregexp, TEST_ALPHABET, method))
+        print(f'{n:>6} {states_cnt:>10} {times[0]:>11.4f} {times[1]:>13.4f} {peaks[0] / 1024:>12.1f} '
+              f'{peaks[1] / 1024:>14.1f}')
+
+
+@benchmark('words')
+def bench_words(sizes: List[int]):
+    """
+    Словарь из n случайных слов длины 4..12 над латиницей: алгоритм Дацюка (построение автомата и отдельно
+    плотная таблица CompiledDKA) против регулярки w1|w2|... (регулярка -- только до 1000 слов)
+    """
+    rnd = random.Random(0)
+    print(f'{"слов":>8} {"состояний":>10} {"Дацюк, с":>9} {"Дацюк, МБ":>10} {"таблица, с":>11} '
+          f'{"регулярка, с":>13} {"регулярка, МБ":>14}')
+    for n in sizes:
+        words = sorted(''.join(rnd.choices(LATIN_ALPHABET, k=rnd.randint(4, 12))) for _ in range(n))
+
+        def build():
+            builder = WordsDKABuilder(LATIN_ALPHABET)
+            for word in words:
+                builder.add(word)
+            return builder.finish()
+
+        t_words = _timeit(build, repeat=1)
+        peak_words = _peak_memory(build)
+        builder = build()
+        t_table = _timeit(builder.to_compiled, repeat=1)
+        t_regexp, peak_regexp = float('nan'), float('nan')
+        if n <= 1000:
+            pregexp = get_postfix_regexp('|'.join(words), LATIN_ALPHABET)
+            t_regexp = _timeit(generate_min_dka_from_pregexp, pregexp, LATIN_ALPHABET, repeat=1)
+            peak_regexp = _peak_memory(generate_min_dka_from_pregexp, pregexp, LATIN_ALPHABET)
+        print(f'{n:>8} {builder.states_cnt:>10} {t_words:>9.3f} {peak_words / 2 ** 20:>10.1f} {t_table:>11.3f} '
+              f'{t_regexp:>13.3f} {peak_regexp / 2 ** 20:>14.1f}')
+
+
+@benchmark('pike')
+def bench_pike(sizes: List[int]):
+    """
+    Разовая проверка 10 слов длины 1000 для (a|b)*a(a|b){n-1}: построение минимального ДКА и проверка
+    против PikeVM прямо по НКА
+    """
+    words = _random_words(10, 1000)
+    print(f'{"n":>4} {"ДКА: построение, с":>19} {"проверка, с":>12} {"PikeVM: построение, с":>22} {"проверка, с":>12}')
+    for n in sizes:
+        pregexp = get_postfix_regexp(_nth_from_end_regexp(n))
+        t_dka = _timeit(generate_min_dka_from_pregexp, pregexp, TEST_ALPHABET, repeat=1)
+        compiled = CompiledDKA.from_min_dka(generate_min_dka_from_pregexp(pregexp, TEST_ALPHABET))
+        t_dka_match = _timeit(compiled.match_many, words, repeat=1)
+        nka = generate_nfsm_from_pregexp(pregexp, TEST_ALPHABET)
+        t_vm = _timeit(PikeVM, nka, TEST_ALPHABET, repeat=1)
+        vm = PikeVM(nka, TEST_ALPHABET)
+        t_vm_match = _timeit(vm.match_many, words, repeat=1)
+        print(f'{n:>4} {t_dka:>19.4f} {t_dka_match:>12.4f} {t_vm:>22.4f} {t_vm_match:>12.4f}')
+
+
+@benchmark('dot')
+def bench_dot(sizes: List[int]):
+    """
+    Выгрузка в DOT без отрисовки: НКА и минимальный ДКА (2^n состояний) для (a|b)*a(a|b){n-1}
+    """
+    print(f'{"n":>4} {"состояний ДКА":>14} {"НКА, с":>8} {"ДКА, с":>8} {"ДКА (до 1000), с":>17}')
+    with tempfile.TemporaryDirectory() as dot_dir:
+        for n in sizes:
+            pregexp = get_postfix_regexp(_nth_from_end_regexp(n))
+            nka = generate_nfsm_from_pregexp(pregexp, TEST_ALPHABET)
+            min_dka = generate_min_dka_from_pregexp(pregexp, TEST_ALPHABET)
+            path = os.path.join(dot_dir, 'graph')
+            t_nka = _timeit(lambda: draw_nka_gz(nka, filename=path, render=False), repeat=1)
+            t_dka = _timeit(lambda: draw_dka_gz(min_dka, filename=path, render=False), repeat=1)
+            t_capped = _timeit(lambda: draw_dka_gz(min_dka, filename=path, render=False, max_states=1000), repeat=1)
+            print(f'{n:>4} {len(min_dka):>14} {t_nka:>8.4f} {t_dka:>8.4f} {t_capped:>17.4f}')
+
+
+@benchmark('equiv')
+def bench_equiv(sizes: List[int]):
+    """
+    Сравнение языков ДКА (без минимизации) для (a|b)*a(a|b){n-1}, построенных через НКА и по followpos:
+    Хопкрофт -- Карп против минимизации обоих автоматов; и поиск различия с (a|b)*a(a|b){n-2}b
+    """
+    print(f'{"n":>4} {"состояний ДКА":>14} {"Хопкрофт -- Карп, с":>20} {"минимизация, с":>15} {"различие, с":>12}')
+    for n in sizes:
+        pregexp = get_postfix_regexp(_nth_from_end_regexp(n))
+        nka = generate_nfsm_from_pregexp(pregexp, TEST_ALPHABET)
+        dka1 = generate_dfsm_from_nfsm(nka.get_as_compact(TEST_ALPHABET), TEST_ALPHABET)
+        dka2 = generate_dfsm_from_pregexp(pregexp, TEST_ALPHABET)
+        other = generate_dfsm_from_pregexp(get_postfix_regexp(_nth_from_end_regexp(n - 1) + 'b'), TEST_ALPHABET)
+        t_hk = _timeit(find_difference, dka1, dka2, repeat=1)
+        t_min = _timeit(lambda: (generate_min_dka_from_dka(dka1, TEST_ALPHABET),
+                                 generate_min_dka_from_dka(dka2, TEST_ALPHABET)), repeat=1)
+        t_diff = _timeit(find_difference, dka1, other, repeat=1)
+        print(f'{n:>4} {len(dka1):>14} {t_hk:>20.4f} {t_min:>15.4f} {t_diff:>12.4f}')
+
+
+@benchmark('compile_many')
+def bench_compile_many(sizes: List[int]):
+    """
+    Построение n регулярок вида (a|b)*w(a|b)* (w -- случайное слово длины 6) в одном процессе и в пуле
+    """
+    jobs = os.cpu_count() or 1
+    print(f'{"регулярок":>10} {"1 процесс, с":>13} {f"{jobs} процессов, с":>16}')
+    for n in sizes:
+        regexps = [f'(a|b)*{x}(a|b)*' for x in _random_words(n, 6)]
+        t_single = _timeit(compile_many, regexps, TEST_ALPHABET, 1, repeat=1)
+        t_pool = _timeit(compile_many, regexps, TEST_ALPHABET, jobs, repeat=1)
+        print(f'{n:>10} {t_single:>13.4f} {t_pool:>16.4f}')
+
+
+def _naive_find_all(dka: CompiledDKA, text: str) -> int:
+    """
+    Число вхождений при переборе начальных позиций: от каждой позиции -- самое длинное совпадение
+    """
+    symbol_ids, table, columns_cnt, finals, dead = \
+        dka.symbol_ids, dka.table, dka.columns_cnt, dka.finals, dka.dead_states
+    found, pos = 0, 0
+    while pos < len(text):
+        offset, end = dka.start * columns_cnt, -1
+        for i in range(pos, len(text)):
+            column = symbol_ids.get(text[i])
+            if column is None:
+                break
+            offset = table[offset + column]
+            if dead[offset // columns_cnt]:
+                break
+            if finals[offset // columns_cnt]:
+                end = i + 1
+        if end < 0:
+            pos += 1
+        else:
+            found += 1
+            pos = end
+    return found
+
+
+@benchmark('search')
+def bench_search(sizes: List[int]):
+    """
+    Поиск всех вхождений a[ab]*c в случайном тексте из n символов a, b, c, d: d встречается примерно раз
+    в 100 символов, c -- в 10 раз реже, поэтому перебор начальных позиций дочитывает до ближайшего d от каждого a
+    """
+    alphabet = list('abcd')
+    searcher = Searcher.from_regexp('a[ab]*c', alphabet)
+    rnd = random.Random(0)
+    # Каждая позиция a...a -- начало вхождения a|a*b, а a*b не становится тупиковым до конца текста
+    prefix_searcher = Searcher.from_regexp('a|a*b', alphabet)
+    print(f'{"символов":>10} {"вхождений":>10} {"Searcher, с":>12} {"млн симв/с":>11} {"перебор, с":>11} '
+          f'{"a|a*b на a^n, с":>16}')
+    for n in sizes:
+        text = ''.join(rnd.choices(alphabet, weights=[500, 490, 1, 10], k=n))
+        t = _timeit(searcher.find_all, text, repeat=1)
+        found = len(searcher.find_all(text))
+        t_naive = f'{_timeit(_naive_find_all, searcher.forward, text, repeat=1):.4f}' if n <= 100000 else '-'
+        t_prefix = _timeit(prefix_searcher.find_all, 'a' * n, repeat=1)
+        print(f'{n:>10} {found:>10} {t:>12.4f} {n / t / 1e6:>11.2f} {t_naive:>11} {t_prefix:>16.4f}')
+
+
+@benchmark('codegen')
+def bench_codegen(sizes: List[int]):
+    """
+    Проверка 100 слов длины 1000 для (a|b)*a(a|b){n-1}: dka_job, CompiledDKA.match и сгенерированный код;
+    генерация -- первое построение модуля в каталоге кэша, загрузка -- повторный импорт из него
+    """
+    print(f'{"n":>3} {"состояний":>10} {"dka_job, с":>11} {"CompiledDKA, с":>15} {"код, с":>9} '
+          f'{"генерация, с":>13} {"загрузка, с":>12}')
+    words = _random_words(100, 1000)
+    for n in sizes:
+        min_dka = generate_min_dka_from_pregexp(get_postfix_regexp(_nth_from_end_regexp(n)), TEST_ALPHABET)
+        compiled = CompiledDKA.from_min_dka(min_dka)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            t_generate = _timeit(compile_matcher, min_dka, cache_dir, repeat=1)
+            t_load = _timeit(compile_matcher, min_dka, cache_dir)
+            match = compile_matcher(min_dka, cache_dir)
+        t_job = _timeit(lambda: [dka_job(min_dka, x) for x in words], repeat=1)
+        t_compiled = _timeit(lambda: [compiled.match(x) for x in words])
+        t_generated = _timeit(lambda: [match(x) for x in words])
+        print(f'{n:>3} {len(min_dka):>10} {t_job:>11.4f} {t_compiled:>15.4f} {t_generated:>9.4f} '
+              f'{t_generate:>13.4f} {t_load:>12.4f}')
+
+
+@benchmark('keywords')
+def bench_keywords(sizes: List[int]):
+    """
+    Полное построение минимального ДКА (разбор, НКА, замыкания, подмножества, минимизация) для альтернативы
+    n случайных слов длины 8 из 10 букв; eps-переходов при построении замыканий должно быть O(n)
+    Пик памяти -- для построения через НКА: замыкания и переходы НКА хранятся списками, маски только у состояний ДКА
+    """
+    rnd = random.Random(0)
+    print(f'{"слов":>6} {"состояний":>10} {"всего, с":>9} {"НКА, с":>7} {"замыкания, с":>13} {"eps-переходов":>14} '
+          f'{"подмножества, с":>16} {"followpos, с":>13} {"пик памяти, МБ":>15}')
+    for n in sizes:
+        regexp = '|'.join(''.join(rnd.choices('abcdefghij', k=8)) for _ in range(n))
+        stats = CompileStats()
+        t = _timeit(lambda: generate_min_dka_from_pregexp(parse_regexp(regexp, LATIN_ALPHABET), LATIN_ALPHABET,
+                                                          stats=stats), repeat=1)
+        t_followpos = _timeit(lambda: generate_min_dka_from_pregexp(parse_regexp(regexp, LATIN_ALPHABET),
+                                                                    LATIN_ALPHABET, method='followpos'), repeat=1)
+        peak = _peak_memory(lambda: generate_min_dka_from_pregexp(parse_regexp(regexp, LATIN_ALPHABET), LATIN_ALPHABET))
+        print(f'{n:>6} {stats.counters["min_dka_states"]:>10} {t:>9.3f} {stats.times["thompson"]:>7.3f} '
+              f'{stats.times["eps_closures"]:>13.3f} {stats.counters["eps_edges"]:>14} '
+              f'{stats.times["subsets"]:>16.3f} {t_followpos:>13.3f} {peak / 2 ** 20:>15.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Бенчмарки построения автоматов')
+    parser.add_argument('name', choices=sorted(BENCHMARKS.keys()), help='Имя бенчмарка')
+    parser.add_argument('--sizes', type=int, nargs='+', help='Размеры входа')
+    args = parser.parse_args()
+    BENCHMARKS[args.name](args.sizes or DEFAULT_SIZES[args.name])
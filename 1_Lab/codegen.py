@@ -0,0 +1,95 @@
+import hashlib
+import marshal
+import os
+import sys
+from typing import List, Callable
+from FSM import MinDFSMState
+from matcher import CompiledDKA
+
+
+MATCHER_TEMPLATE = '''# Сгенерировано codegen.py по минимальному ДКА: {states_cnt} состояний, {columns_cnt} столбцов
+
+
+class _Columns(dict):
+    def __missing__(self, code):
+        raise ValueError(f'Символа {{chr(code)}} нет в допустимом алфавите!')
+
+
+_COLUMNS = _Columns({columns})
+_TABLE = {table}
+_FINALS = frozenset({finals})
+
+
+def match(word, table=_TABLE, columns=_COLUMNS):
+    offset = {start}
+    for column in {codes}:
+        offset = table[offset + column]
+    return offset in _FINALS
+
+
+def match_many(words):
+    return [match(word) for word in words]
+'''
+
+
+def generate_matcher_source(dka: List[MinDFSMState]) -> str:
+    """
+    Исходный код модуля Python с функциями match(word) и match_many(words) для минимального ДКА
+    Таблица переходов CompiledDKA зашита в константы модуля. Символы слова переводятся в номера столбцов
+    одним вызовом str.translate (на C), поэтому в цикле по символам остаются только сложение и обращение
+    к кортежу, без поиска в словаре
+    """
+    compiled = CompiledDKA.from_min_dka(dka)
+    columns_cnt = compiled.columns_cnt
+    if columns_cnt <= 256:  # Номер столбца помещается в байт: перебор байтов быстрее, чем ord на каждом символе
+        codes = "word.translate(columns).encode('latin-1')"
+    else:
+        codes = 'map(ord, word.translate(columns))'
+    return MATCHER_TEMPLATE.format(
+        states_cnt=compiled.states_cnt,
+        columns_cnt=columns_cnt,
+        columns=repr({ord(sym): chr(column) for sym, column in sorted(compiled.symbol_ids.items())}),
+        table=repr(tuple(compiled.table)),
+        finals=repr({state * columns_cnt for state, is_final in enumerate(compiled.finals) if is_final}),
+        start=compiled.start * columns_cnt,
+        codes=codes,
+    )
+
+
+def compile_matcher(dka: List[MinDFSMState], cache_dir: str = None) -> Callable[[str], bool]:
+    """
+    Функция проверки слова, сгенерированная по минимальному ДКА (см. generate_matcher_source)
+    :param cache_dir: Каталог кэша модулей, имена файлов -- по хэшу исходника: name.py -- исходник (для чтения),
+        name.<версия Python>.code -- его байт-код (marshal), так что следующие процессы не компилируют таблицу
+        заново. Байт-код пишется сам, без __pycache__, поэтому кэш работает и при PYTHONDONTWRITEBYTECODE
+    :return: match(word) -> bool, для символа не из алфавита -- ValueError
+    """
+    source = generate_matcher_source(dka)
+    name = f'dka_{hashlib.sha256(source.encode("utf-8")).hexdigest()[:16]}'
+    code = None
+    if cache_dir is not None:
+        code_path = os.path.join(cache_dir, f'{name}.{sys.implementation.cache_tag}.code')
+        try:
+            with open(code_path, 'rb') as f:
+                code = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):  # Нет файла или он битый -- компилируем заново
+            pass
+    if code is None:
+        code = compile(source, f'{name}.py', 'exec')
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            __write_atomic(os.path.join(cache_dir, f'{name}.py'), source.encode('utf-8'))
+            __write_atomic(code_path, marshal.dumps(code))
+    namespace = {'__name__': name}
+    exec(code, namespace)
+    return namespace['match']
+
+
+def __write_atomic(path: str, data: bytes):
+    """
+    Запись через временный файл: параллельные процессы не прочитают недописанный файл
+    """
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Iterable, Optional, Tuple
+from regexp_process import get_postfix_regexp
+from FSM import MinDFSMState, CompileStats, generate_min_dka_from_pregexp, _stage
+from matcher import CompiledDKA
+
+
+def dump_min_dka(dka: List[MinDFSMState]) -> List[Tuple[str, bool, List[Tuple[str, str]], List[int]]]:
+    """
+    Минимальный ДКА в виде простых списков (для JSON/pickle): [(state, is_final, outputs, tags), ...]
+    Множества состояний исходного ДКА не сохраняются
+    """
+    return [(state.state, state.is_final, list(state.outputs), sorted(state.tags)) for state in dka]
+
+
+def load_min_dka(data: List) -> List[MinDFSMState]:
+    """
+    Восстановление минимального ДКА из dump_min_dka
+    """
+    ans = []
+    for name, is_final, outputs, tags in data:
+        state = MinDFSMState(state=name, dka_states=set(), outputs=[tuple(x) for x in outputs], tags=frozenset(tags))
+        state.is_final = is_final  # Имя уже содержит 'f', повторно не добавляем
+        ans.append(state)
+    return ans
+
+
+class CompileCache:
+    """
+    Кэш минимальных ДКА по ключу (регулярка, алфавит)
+    В памяти -- LRU не более чем на max_size автоматов, на диске (если задан cache_dir) -- JSON-файл на автомат,
+    так что новые процессы с тем же cache_dir стартуют с готовыми автоматами
+    Возвращаемые автоматы общие для всех вызовов, изменять их нельзя
+    """
+
+    def __init__(self, max_size: int = 128, cache_dir: str = None):
+        if max_size < 1:
+            raise ValueError('Размер кэша должен быть положительным')
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.__lru = OrderedDict()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(regexp: str, alphabet: List[str]) -> str:
+        return hashlib.sha256(json.dumps([regexp, list(alphabet)]).encode('utf-8')).hexdigest()
+
+    def __len__(self):
+        return len(self.__lru)
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def __remember(self, key: str, dka: List[MinDFSMState]):
+        self.__lru[key] = dka
+        self.__lru.move_to_end(key)
+        while len(self.__lru) > self.max_size:
+            self.__lru.popitem(last=False)
+
+    def get(self, regexp: str, alphabet: List[str]) -> Optional[List[MinDFSMState]]:
+        """
+        Автомат из кэша (памяти или диска) или None
+        """
+        key = self.key(regexp, alphabet)
+        try:
+            dka = self.__lru[key]
+        except KeyError:
+            pass
+        else:
+            self.__lru.move_to_end(key)
+            self.hits += 1
+            return dka
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self.__path(key)) as f:
+                dka = load_min_dka(json.load(f))
+        except (OSError, ValueError):  # Нет файла или он битый -- считаем промахом
+            return None
+        self.disk_hits += 1
+        self.__remember(key, dka)
+        return dka
+
+    def put(self, regexp: str, alphabet: List[str], dka: List[MinDFSMState]):
+        key = self.key(regexp, alphabet)
+        self.__remember(key, dka)
+        if self.cache_dir is not None:
+            tmp_path = f'{self.__path(key)}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(dump_min_dka(dka), f)
+            os.replace(tmp_path, self.__path(key))  # Атомарно: параллельные процессы не увидят недописанный файл
+
+    def compile(self, regexp: str, alphabet: List[str], stats: CompileStats = None) -> List[MinDFSMState]:
+        """
+        Минимальный ДКА для регулярки: из кэша или построенный заново (и сохраненный в кэш)
+        :param stats: Статистика построения (заполняется только при промахе, см. CompileStats)
+        """
+        dka = self.get(regexp, alphabet)
+        if dka is None:
+            self.misses += 1
+            with _stage(stats, 'parse'):
+                pregexp = get_postfix_regexp(regexp, alphabet)
+            dka = generate_min_dka_from_pregexp(pregexp, alphabet, stats=stats)
+            self.put(regexp, alphabet, dka)
+        return dka
+
+
+def _compile_one(task: Tuple[str, List[str], str]) -> CompiledDKA:
+    regexp, alphabet, method = task
+    return CompiledDKA.from_min_dka(generate_min_dka_from_pregexp(get_postfix_regexp(regexp, alphabet), alphabet,
+                                                                  method))
+
+
+def compile_many(regexps: Iterable[str], alphabet: List[str], jobs: int = None,
+                 method: str = 'thompson') -> List[CompiledDKA]:
+    """
+    Построение скомпилированных минимальных ДКА для набора регулярок в пуле процессов
+    Построения независимы (номера состояний у каждого свои), CompiledDKA -- плоские списки, поэтому
+    результаты дешево передаются между процессами
+    :param regexps: Регулярки
+    :param alphabet: Допустимый алфавит
+    :param jobs: Число процессов (None -- по числу ядер, 1 -- в текущем процессе)
+    :param method: Способ построения ДКА (см. generate_min_dka_from_pregexp)
+    :return: Автоматы в порядке регулярок
+    :raise RegexpError: Ошибка в одной из регулярок
+    """
+    tasks = [(regexp, list(alphabet), method) for regexp in regexps]
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(tasks) <= 1:
+        return [_compile_one(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(_compile_one, tasks, chunksize=max(1, len(tasks) // (4 * jobs))))
@@ -0,0 +1,128 @@
+from collections import deque
+from typing import List, Dict, Optional, Tuple, Union
+from FSM import DFSMState, MinDFSMState
+
+
+DKA = Union[List[DFSMState], List[MinDFSMState]]
+
+
+def find_difference(dka1: DKA, dka2: DKA) -> Optional[str]:
+    """
+    Кратчайшее слово, которое допускает ровно один из автоматов (алгоритм Хопкрофта -- Карпа)
+    Автоматы -- ДКА или минимальные ДКА, минимизировать их не нужно
+    Пары состояний обходятся в ширину прямо по переходам, без построения произведения; пары, уже связанные через
+    систему непересекающихся множеств, не обходятся повторно, поэтому пар рассматривается не больше, чем состояний
+    в обоих автоматах. Обход в ширину дает кратчайшее различающее слово
+    :return: None, если автоматы допускают один и тот же язык
+    """
+    start1, finals1, moves1 = __tables(dka1)
+    start2, finals2, moves2 = __tables(dka2)
+    alphabet = __common_alphabet(moves1, moves2)
+    offset = len(finals1)  # Состояния второго автомата в системе множеств -- со сдвигом
+    parent = list(range(len(finals1) + len(finals2)))
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(x: int, y: int) -> bool:
+        x, y = find(x), find(y)
+        if x == y:
+            return False
+        parent[x] = y
+        return True
+
+    start = (start1, start2)
+    if finals1[start1] != finals2[start2]:
+        return ''
+    union(start1, start2 + offset)
+    came_from: Dict[Tuple[int, int], Tuple[Tuple[int, int], str]] = {start: None}
+    queue = deque([start])
+    while len(queue) > 0:
+        pair = queue.popleft()
+        state1, state2 = pair
+        for sym in alphabet:
+            to_state1 = moves1[state1].get(sym, len(moves1) - 1)
+            to_state2 = moves2[state2].get(sym, len(moves2) - 1)
+            if not union(to_state1, to_state2 + offset):
+                continue
+            to_pair = (to_state1, to_state2)
+            came_from[to_pair] = (pair, sym)
+            if finals1[to_state1] != finals2[to_state2]:
+                return __restore_word(came_from, to_pair)
+            queue.append(to_pair)
+    return None
+
+
+def find_inclusion_counterexample(dka1: DKA, dka2: DKA) -> Optional[str]:
+    """
+    Кратчайшее слово, которое допускает dka1 и не допускает dka2
+    Пары состояний обходятся в ширину по мере надобности (произведение целиком не строится), обход
+    останавливается на первой паре "финальное -- нефинальное"
+    :return: None, если язык dka1 содержится в языке dka2
+    """
+    start1, finals1, moves1 = __tables(dka1)
+    start2, finals2, moves2 = __tables(dka2)
+    alphabet = __common_alphabet(moves1, moves2)
+    start = (start1, start2)
+    if finals1[start1] and not finals2[start2]:
+        return ''
+    came_from: Dict[Tuple[int, int], Tuple[Tuple[int, int], str]] = {start: None}
+    queue = deque([start])
+    dead1 = len(moves1) - 1
+    while len(queue) > 0:
+        pair = queue.popleft()
+        state1, state2 = pair
+        for sym in alphabet:
+            to_pair = (moves1[state1].get(sym, dead1), moves2[state2].get(sym, len(moves2) - 1))
+            if to_pair in came_from or to_pair[0] == dead1:
+                continue
+            came_from[to_pair] = (pair, sym)
+            if finals1[to_pair[0]] and not finals2[to_pair[1]]:
+                return __restore_word(came_from, to_pair)
+            queue.append(to_pair)
+    return None
+
+
+def is_equivalent(dka1: DKA, dka2: DKA) -> bool:
+    return find_difference(dka1, dka2) is None
+
+
+def is_subset(dka1: DKA, dka2: DKA) -> bool:
+    """
+    Содержится ли язык dka1 в языке dka2
+    """
+    return find_inclusion_counterexample(dka1, dka2) is None
+
+
+def __tables(dka: DKA) -> Tuple[int, List[bool], List[Dict[str, int]]]:
+    """
+    Начальное состояние, финальность и переходы по номерам; последнее состояние -- добавленное тупиковое,
+    в него ведут переходы по символам, которых у состояния нет
+    """
+    index = {state.state: i for i, state in enumerate(dka)}
+    start = [i for i, state in enumerate(dka) if 's' in state.state][0]
+    finals = [state.is_final for state in dka] + [False]
+    moves = [{sym: index[ostate] for ostate, sym in state.outputs} for state in dka] + [{}]
+    return start, finals, moves
+
+
+def __common_alphabet(moves1: List[Dict[str, int]], moves2: List[Dict[str, int]]) -> List[str]:
+    """
+    Все символы переходов обоих автоматов (отсортированы, чтобы контрпример не зависел от порядка переходов)
+    """
+    alphabet = set()
+    for moves in (moves1, moves2):
+        for state_moves in moves:
+            alphabet.update(state_moves)
+    return sorted(alphabet)
+
+
+def __restore_word(came_from: Dict, pair: Tuple[int, int]) -> str:
+    word = []
+    while came_from[pair] is not None:
+        pair, sym = came_from[pair]
+        word.append(sym)
+    return ''.join(reversed(word))
@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Iterator, Optional, Tuple
+from regexp_process import ALPHABETS, get_postfix_regexp
+from FSM import DKA_METHODS, generate_min_dka_from_pregexp, dka_job
+from matcher import CompiledDKA
+
+
+SIZE_CLASSES = (4, 16, 64)  # Число операндов в регулярках для замеров
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perf_baseline.json')
+
+
+def random_regexp(rnd: random.Random, alphabet: List[str], size: int) -> str:
+    """
+    Случайная регулярка из size операндов (символы, '.', классы [...] и [^...]) с альтернативой, * и +
+    Синтаксис общий для parse_regexp и модуля re: альтернатива и повторяемые выражения всегда в скобках,
+    берутся только буквы и цифры алфавита, чтобы не нужно было экранирование
+    """
+    symbols = [x for x in alphabet if x.isalnum()]
+    if size == 1:
+        kind = rnd.random()
+        if kind < 0.7:
+            ans = rnd.choice(symbols)
+        elif kind < 0.8:
+            ans = '.'
+        else:
+            negate = len(symbols) > 1 and rnd.random() < 0.5
+            members = sorted(rnd.sample(symbols, rnd.randint(1, len(symbols) - 1 if negate else len(symbols))))
+            ans = f'[{"^" if negate else ""}{"".join(members)}]'
+        is_atom = True
+    else:
+        left_size = rnd.randint(1, size - 1)
+        left, right = random_regexp(rnd, alphabet, left_size), random_regexp(rnd, alphabet, size - left_size)
+        if rnd.random() < 0.3:
+            ans, is_atom = f'({left}|{right})', True
+        else:
+            ans, is_atom = left + right, False
+    kind = rnd.random()
+    if kind < 0.25:
+        ans = f'{ans if is_atom else f"({ans})"}{"*" if kind < 0.15 else "+"}'
+    return ans
+
+
+def random_words(rnd: random.Random, alphabet: List[str], count: int, max_len: int) -> List[str]:
+    symbols = [x for x in alphabet if x.isalnum()]
+    return [''.join(rnd.choices(symbols, k=rnd.randint(0, max_len))) for _ in range(count)]
+
+
+@contextmanager
+def _time_limit(seconds: float) -> Iterator[None]:
+    """
+    TimeoutError, если блок выполняется дольше seconds (через SIGALRM, поэтому только в главном потоке
+    и не на Windows; иначе без ограничения)
+    """
+    if not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise TimeoutError()
+
+    old_handler = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old_handler)
+
+
+def find_mismatch(regexp: str, alphabet: List[str], words: List[str],
+                  re_timeout: float = 1.0) -> Optional[Tuple[str, str]]:
+    """
+    Сравнение минимальных ДКА (всеми способами построения) с re.fullmatch
+    :param re_timeout: Ограничение времени на re (секунды): перебор с возвратами экспоненциален
+        на вложенных повторениях вроде ((a*)*b*)*c
+    :return: None или (способ построения, слово, на котором ответы различаются)
+    :raise TimeoutError: re не уложился в re_timeout
+    """
+    with _time_limit(re_timeout):
+        expected = [re.fullmatch(regexp, word, re.DOTALL) is not None for word in words]
+    for method in DKA_METHODS:
+        min_dka = generate_min_dka_from_pregexp(get_postfix_regexp(regexp, alphabet), alphabet, method)
+        for word, is_ok in zip(words, expected):
+            if dka_job(min_dka, word) != is_ok:
+                return method, word
+    return None
+
+
+def fuzz(count: int, alphabet: List[str], seed: int = 0, max_size: int = 12,
+         words_cnt: int = 50) -> Tuple[List[Tuple[str, str, str]], int]:
+    """
+    Дифференциальная проверка на count случайных регулярках
+    :return: Расхождения (регулярка, способ построения, слово) и число регулярок, пропущенных из-за долгого re
+    """
+    rnd = random.Random(seed)
+    failures, skipped = [], 0
+    for _ in range(count):
+        regexp = random_regexp(rnd, alphabet, rnd.randint(1, max_size))
+        try:
+            mismatch = find_mismatch(regexp, alphabet, random_words(rnd, alphabet, words_cnt, 10))
+        except TimeoutError:
+            skipped += 1
+            continue
+        if mismatch is not None:
+            failures.append((regexp, ) + mismatch)
+    return failures, skipped
+
+
+def _best_time(func, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        st = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - st)
+    return best
+
+
+def measure(alphabet: List[str], seed: int = 0, regexps_cnt: int = 20, words_cnt: int = 100,
+            word_len: int = 50) -> Dict[str, Dict[str, float]]:
+    """
+    Время на одних и тех же (при том же seed) случайных регулярках каждого класса размера, лучшее из 3 запусков:
+    compile -- разбор и построение минимальных ДКА, dka_job и compiled -- проверка слов через dka_job
+    и через CompiledDKA
+    :return: {размер: {метрика: секунды на все регулярки класса}}
+    """
+    ans = {}
+    for size in SIZE_CLASSES:
+        rnd = random.Random(seed * 1000 + size)
+        regexps = [random_regexp(rnd, alphabet, size) for _ in range(regexps_cnt)]
+        words = [''.join(rnd.choices(alphabet, k=word_len)) for _ in range(words_cnt)]
+        dkas = [generate_min_dka_from_pregexp(get_postfix_regexp(x, alphabet), alphabet) for x in regexps]
+        compiled = [CompiledDKA.from_min_dka(x) for x in dkas]
+        times = {
+            'compile': _best_time(lambda: [generate_min_dka_from_pregexp(get_postfix_regexp(x, alphabet), alphabet)
+                                           for x in regexps]),
+            'dka_job': _best_time(lambda: [dka_job(dka, word) for dka in dkas for word in words]),
+            'compiled': _best_time(lambda: [x.match_many(words) for x in compiled]),
+        }
+        ans[str(size)] = {metric: round(t, 6) for metric, t in times.items()}
+    return ans
+
+
+def machine_info() -> Dict[str, str]:
+    return {'python': platform.python_version(), 'machine': platform.machine(), 'processor': platform.processor()}
+
+
+def find_regressions(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+                     tolerance: float = 0.5) -> List[str]:
+    """
+    Метрики, которые медленнее базовых больше чем в 1 + tolerance раз
+    """
+    ans = []
+    for size, metrics in current.items():
+        for metric, t in metrics.items():
+            base = baseline.get(size, {}).get(metric)
+            if base is not None and t > base * (1 + tolerance):
+                ans.append(f'размер {size}, {metric}: {t:.4f} с против {base:.4f} с (x{t / base:.2f})')
+    return ans
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Сравнение минимальных ДКА с re.fullmatch на случайных регулярках '
+                                                 'и замер времени против сохраненной базы')
+    parser.add_argument('--alphabet', choices=sorted(ALPHABETS), default='test', help='Алфавит')
+    parser.add_argument('--count', type=int, default=1000, help='Число случайных регулярок')
+    parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора')
+    parser.add_argument('--max-size', type=int, default=12, help='Наибольшее число операндов в регулярке')
+    parser.add_argument('--perf', action='store_true', help='Замерить время и сравнить с базой')
+    parser.add_argument('--update-baseline', action='store_true', help='Замерить время и сохранить как базу')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Файл базы замеров')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Допустимое замедление (0.5 -- на 50%%)')
+    args = parser.parse_args(argv)
+
+    alphabet = ALPHABETS[args.alphabet]
+    if not args.perf and not args.update_baseline:
+        failures, skipped = fuzz(args.count, alphabet, args.seed, args.max_size)
+        for regexp, method, word in failures:
+            print(f'Расхождение с re: регулярка "{regexp}", способ {method}, слово "{word}"')
+        print(f'Регулярок: {args.count}, расхождений: {len(failures)}, пропущено из-за долгого re: {skipped}')
+        return 1 if len(failures) > 0 else 0
+
+    current = measure(alphabet, args.seed)
+    for size, metrics in current.items():
+        print(f'размер {size}: ' + ', '.join(f'{metric} {t:.4f} с' for metric, t in metrics.items()))
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'machine': machine_info(), 'alphabet': args.alphabet, 'times': current}, f, indent=2)
+        print(f'База сохранена в {args.baseline}')
+        return 0
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except OSError:
+        print(f'Нет базы {args.baseline}, сохраните ее через --update-baseline', file=sys.stderr)
+        return 1
+    if baseline['alphabet'] != args.alphabet:
+        print(f'База снята на алфавите {baseline["alphabet"]}', file=sys.stderr)
+        return 1
+    if baseline['machine'] != machine_info():
+        print('База снята на другой машине или версии Python, сравнение приблизительное', file=sys.stderr)
+    regressions = find_regressions(current, baseline['times'], args.tolerance)
+    for message in regressions:
+        print(f'Замедление: {message}')
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
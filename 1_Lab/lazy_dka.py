@@ -0,0 +1,88 @@
+from typing import List, Iterable
+from FSM import NKA
+
+
+class LazyDKA:
+    """
+    ДКА, состояния которого строятся из множеств состояний НКА только тогда, когда до них доходит ввод
+    Построенные состояния и переходы хранятся в кэше не более чем из max_states состояний;
+    при переполнении кэш сбрасывается целиком, поэтому память ограничена независимо от размера полного ДКА
+    """
+
+    def __init__(self, nka: NKA, alphabet: List[str], max_states: int = 10000):
+        """
+        :param nka: НКА (результат generate_nfsm_from_pregexp)
+        :param alphabet: Допустимый алфавит
+        :param max_states: Максимальное число состояний ДКА в кэше
+        """
+        if max_states < 2:
+            raise ValueError('В кэше должно помещаться хотя бы два состояния')
+        nfsm = nka.get_as_compact(alphabet)
+        self.alphabet = list(alphabet)
+        self.symbol_ids = {sym: i for i, sym in enumerate(self.alphabet)}
+        self.max_states = max_states
+        self.flushes = 0
+        self.__moves = nfsm.move_lists()
+        self.__nka_finals = frozenset(nfsm.finals)
+        self.__start_key = nfsm.closure_lists()[nfsm.start]
+        self.__reset_cache()
+
+    def __reset_cache(self):
+        self.__keys = []  # Отсортированный кортеж состояний НКА для каждого состояния ДКА из кэша
+        self.__index = {}  # Кортеж -> номер состояния в кэше
+        self.__transitions = []  # Переходы, -1 -- еще не построен
+        self.__finals = []
+        self.start = self.__add_state(self.__start_key)
+
+    def __add_state(self, key: tuple) -> int:
+        state = len(self.__keys)
+        self.__keys.append(key)
+        self.__index[key] = state
+        self.__transitions.append([-1] * len(self.alphabet))
+        self.__finals.append(not self.__nka_finals.isdisjoint(key))
+        return state
+
+    @property
+    def cached_states_cnt(self) -> int:
+        return len(self.__keys)
+
+    def __build_transition(self, state: int, sym_id: int) -> int:
+        """
+        Построение перехода из состояния кэша state по символу; может сбросить кэш,
+        поэтому возвращаемый номер действителен только для кэша после вызова
+        """
+        move = [states for nka_state in self.__keys[state]
+                for move_sym_id, states in self.__moves[nka_state] if move_sym_id == sym_id]
+        u = move[0] if len(move) == 1 else tuple(sorted(set().union(*move)))
+        try:
+            to_state = self.__index[u]
+        except KeyError:
+            if len(self.__keys) >= self.max_states:
+                self.flushes += 1
+                self.__reset_cache()
+                if u == self.__start_key:
+                    return self.start
+                return self.__add_state(u)
+            to_state = self.__add_state(u)
+        self.__transitions[state][sym_id] = to_state
+        return to_state
+
+    def match(self, word: str) -> bool:
+        """
+        Проверка слова с достраиванием ДКА по мере необходимости
+        """
+        symbol_ids = self.symbol_ids
+        state = self.start
+        for sym in word:
+            try:
+                sym_id = symbol_ids[sym]
+            except KeyError:
+                raise ValueError(f'Символа {sym} нет в допустимом алфавите!')
+            to_state = self.__transitions[state][sym_id]
+            if to_state < 0:
+                to_state = self.__build_transition(state, sym_id)
+            state = to_state
+        return self.__finals[state]
+
+    def match_many(self, words: Iterable[str]) -> List[bool]:
+        return [self.match(word) for word in words]
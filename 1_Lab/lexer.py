@@ -0,0 +1,65 @@
+from typing import List, Tuple, Iterable, Iterator, NamedTuple
+from regexp_process import parse_regexp
+from matcher import CompiledDKA, PrefixScanner
+from multi_dka import generate_multi_min_dka
+
+
+class Token(NamedTuple):
+    name: str
+    text: str
+    pos: int
+
+
+class LexerError(Exception):
+    def __init__(self, message: str, pos: int):
+        self.message = message
+        self.pos = pos
+
+    def __str__(self):
+        return self.message
+
+
+class Lexer:
+    """
+    Лексический анализатор по правилам (имя токена, регулярка)
+    Все правила собираются в один минимальный ДКА с метками (generate_multi_min_dka). Токен -- самый длинный
+    префикс остатка строки, допускаемый хотя бы одним правилом; если таких правил несколько, побеждает
+    правило, записанное раньше (ключевые слова ставятся перед идентификаторами)
+    """
+
+    def __init__(self, rules: List[Tuple[str, str]], alphabet: List[str], skip: Iterable[str] = ()):
+        """
+        :param rules: Правила (имя токена, регулярка) в порядке убывания приоритета
+        :param alphabet: Допустимый алфавит
+        :param skip: Имена токенов, которые не выдаются (пробелы, комментарии)
+        """
+        if len(rules) == 0:
+            raise ValueError('Нужно хотя бы одно правило')
+        self.names = [name for name, _ in rules]
+        self.skip = frozenset(skip)
+        self.dka = CompiledDKA.from_min_dka(
+            generate_multi_min_dka([parse_regexp(regexp, alphabet) for _, regexp in rules], alphabet))
+        # Для каждого состояния: номер побеждающего правила (-1 -- не финальное)
+        self.rules = [min(tags, default=-1) for tags in self.dka.tags]
+        if self.rules[self.dka.start] >= 0:
+            name = self.names[self.rules[self.dka.start]]
+            raise ValueError(f'Правило {name} допускает пустое слово')
+
+    def tokenize(self, text: str) -> Iterator[Token]:
+        """
+        Разбиение текста на токены (самое длинное совпадение, слева направо) за O(len(text) * число состояний)
+        Чтение токена останавливается в тупиковом состоянии, а пары (позиция, состояние), из которых уже
+        не удалось дойти до финального, запоминаются (PrefixScanner), поэтому хвост, прочитанный
+        за концом токена, не перечитывается: правила a и a*b на a...a не дают квадратичного времени
+        :raise LexerError: Ни одно правило не подходит в позиции pos
+        """
+        scanner = PrefixScanner(self.dka, text)
+        pos = 0
+        while pos < len(text):
+            end, state = scanner.longest_prefix(pos)
+            if end < 0:
+                raise LexerError(f'Неизвестная лексема в позиции {pos}: "{text[pos:pos+10]}"', pos)
+            name = self.names[self.rules[state]]
+            if name not in self.skip:
+                yield Token(name, text[pos:end], pos)
+            pos = end
@@ -1,6 +1,7 @@
+import sys
 from tabulate import tabulate
 from utils import format_table_for_tabulate_dka, format_table_for_tabulate_nka
-from regexp_process import get_postfix_regexp, TEST_ALPHABET, ALL_TEST_SYMBOLS, RegexpError
+from regexp_process import get_postfix_regexp, TEST_ALPHABET, RegexpError
 from FSM import generate_nfsm_from_pregexp, draw_nka_gz, \
     generate_dfsm_from_nfsm, draw_dka_gz, \
     generate_min_dka_from_dka, \
@@ -17,17 +18,22 @@ from FSM import generate_nfsm_from_pregexp, draw_nka_gz, \
 
 
 if __name__ == '__main__':
+    # Пакетный режим без диалога и графики: python3 main.py batch <регулярка> [файл со словами]
+    if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+        from batch import main as batch_main
+        sys.exit(batch_main(sys.argv[2:]))
+
+    # python3 main.py --no-render -- только DOT-файлы, без запуска Graphviz (для машин без дисплея)
+    render = '--no-render' not in sys.argv[1:]
+
     # Ввод регулярки
     TEST_REGEXP = input('Введите выражение, для которого необходимо построить автомат: ')
-    if [x for x in TEST_REGEXP if x not in ALL_TEST_SYMBOLS]:
-        print('Выражение не соответствует допустимому алфавиту')
-        exit(1)
 
     # Построение постфиксной формы
     postfix_regexp = ''
     try:
         postfix_regexp = get_postfix_regexp(TEST_REGEXP)
-        print(f'Постфиксная запись регулярного выражения: {"".join(postfix_regexp)}')
+        print(f'Постфиксная запись регулярного выражения: {"".join(map(str, postfix_regexp))}')
     except RegexpError as e:
         print(e)
         exit(1)
@@ -37,21 +43,21 @@ if __name__ == '__main__':
     table, headers = format_table_for_tabulate_nka(nka.get_as_table(TEST_ALPHABET), TEST_ALPHABET)
     print('\nНКА:')
     print(tabulate(table, headers=headers))
-    draw_nka_gz(nka)
+    draw_nka_gz(nka, render=render)
 
     # Генерация ДКА и вывод
-    dka = generate_dfsm_from_nfsm(nka.get_as_table(TEST_ALPHABET), TEST_ALPHABET)
+    dka = generate_dfsm_from_nfsm(nka.get_as_compact(TEST_ALPHABET), TEST_ALPHABET)
     table, headers = format_table_for_tabulate_dka(dka, TEST_ALPHABET)
     print('\nДКА:')
     print(tabulate(table, headers=headers))
-    draw_dka_gz(dka)
+    draw_dka_gz(dka, render=render)
 
     # Генерация минимального ДКА и вывод
     min_dka = generate_min_dka_from_dka(dka, TEST_ALPHABET)
     table, headers = format_table_for_tabulate_dka(min_dka, TEST_ALPHABET)
     print('\nМинимальный ДКА:')
     print(tabulate(table, headers=headers))
-    draw_dka_gz(min_dka, is_min=True)
+    draw_dka_gz(min_dka, is_min=True, render=render)
 
     # Цикл моделирования работы КА
     to_check = ''
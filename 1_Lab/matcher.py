@@ -0,0 +1,283 @@
+import mmap
+from typing import List, Dict, FrozenSet, Iterable, Optional, Tuple, Union
+from FSM import MinDFSMState
+
+
+class CompiledDKA:
+    """
+    Скомпилированный ДКА для быстрой проверки слов
+    Состояния -- номера 0..n-1, переходы хранятся в плотной таблице: строка -- состояние, столбец -- класс символов
+    (символы с одинаковыми переходами из всех состояний делят один столбец). В table хранится
+    to_state * columns_cnt (номер строки сразу умножен на ширину), чтобы на каждом символе было
+    одно сложение и одно обращение к списку
+    """
+
+    def __init__(self, symbol_ids: Dict[str, int], start: int, finals: List[bool], table: List[int],
+                 tags: List[FrozenSet[int]] = None):
+        """
+        :param symbol_ids: Символ -> номер столбца таблицы
+        :param start: Номер начального состояния
+        :param finals: Финальность каждого состояния
+        :param table: Таблица переходов table[state * columns_cnt + column] = to_state
+        :param tags: Номера допускаемых шаблонов для каждого состояния (для автомата из нескольких регулярок)
+        """
+        self.symbol_ids = dict(symbol_ids)
+        self.columns_cnt = max(self.symbol_ids.values(), default=-1) + 1
+        self.start = start
+        self.finals = list(finals)
+        self.tags = list(tags) if tags is not None else [frozenset()] * len(self.finals)
+        self.table = [to_state * self.columns_cnt for to_state in table]
+        self.__byte_ids = None
+        self.__dead_states = None
+
+    @classmethod
+    def from_min_dka(cls, dka: List[MinDFSMState]) -> 'CompiledDKA':
+        """
+        Компиляция минимального ДКА (результата generate_min_dka_from_dka)
+        """
+        index = {state.state: i for i, state in enumerate(dka)}
+        targets = {}  # Символ -> столбец переходов по нему
+        for i, state in enumerate(dka):
+            for ostate, sym in state.outputs:
+                column = targets.get(sym)
+                if column is None:  # Не setdefault: он создавал бы новый список на каждом переходе
+                    column = targets[sym] = [0] * len(dka)
+                column[i] = index[ostate]
+        columns = {}
+        symbol_ids = {sym: columns.setdefault(tuple(column), len(columns)) for sym, column in targets.items()}
+        table = [0] * (len(dka) * len(columns))
+        for column_id, column in enumerate(columns):
+            for i, to_state in enumerate(column):
+                table[i * len(columns) + column_id] = to_state
+        start = [i for i, state in enumerate(dka) if state.is_start_state()][0]
+        return cls(symbol_ids, start, [state.is_final for state in dka], table, [state.tags for state in dka])
+
+    @property
+    def alphabet(self) -> List[str]:
+        return list(self.symbol_ids)
+
+    @property
+    def states_cnt(self) -> int:
+        return len(self.finals)
+
+    @property
+    def byte_ids(self) -> List[Optional[int]]:
+        """
+        Номера столбцов для байтов 0..255 (байт b соответствует символу chr(b)), None -- символа нет в алфавите
+        """
+        if self.__byte_ids is None:
+            self.__byte_ids = [self.symbol_ids.get(chr(b)) for b in range(256)]
+        return self.__byte_ids
+
+    @property
+    def dead_states(self) -> List[bool]:
+        """
+        Тупиковые состояния: из них не достижимо ни одно финальное, дальше читать слово бессмысленно
+        """
+        if self.__dead_states is None:
+            sources = [[] for _ in range(self.states_cnt)]
+            for offset, to_offset in enumerate(self.table):
+                sources[to_offset // self.columns_cnt].append(offset // self.columns_cnt)
+            alive = list(self.finals)
+            stack = [state for state, is_alive in enumerate(alive) if is_alive]
+            while len(stack) > 0:
+                for state in sources[stack.pop()]:
+                    if not alive[state]:
+                        alive[state] = True
+                        stack.append(state)
+            self.__dead_states = [not x for x in alive]
+        return self.__dead_states
+
+    def stream(self) -> 'DKAStream':
+        """
+        Новая проверка слова, подаваемого по частям
+        """
+        return DKAStream(self)
+
+    def match_chunks(self, chunks: Iterable[Union[str, bytes]]) -> bool:
+        """
+        Проверка слова, заданного последовательностью частей (строк или байтов)
+        """
+        stream = self.stream()
+        for chunk in chunks:
+            stream.feed(chunk)
+        return stream.finish()
+
+    def match_file(self, path: str, chunk_size: int = 1 << 20) -> bool:
+        """
+        Проверка содержимого файла как одного слова; файл отображается в память через mmap
+        и читается блоками по chunk_size байт, поэтому целиком в память не загружается
+        """
+        stream = self.stream()
+        with open(path, 'rb') as f:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # Пустой файл нельзя отобразить в память
+                return stream.finish()
+            with mm:
+                for pos in range(0, len(mm), chunk_size):
+                    stream.feed(mm[pos:pos + chunk_size])
+        return stream.finish()
+
+    def step(self, state: int, sym: str) -> int:
+        """
+        Переход из состояния state по символу sym
+        """
+        try:
+            return self.table[state * self.columns_cnt + self.symbol_ids[sym]] // self.columns_cnt
+        except KeyError:
+            raise ValueError(f'Символа {sym} нет в допустимом алфавите!')
+
+    def match(self, word: str) -> bool:
+        """
+        Проверка слова за O(len(word))
+        """
+        table, symbol_ids = self.table, self.symbol_ids
+        offset = self.start * self.columns_cnt
+        try:
+            for sym in word:
+                offset = table[offset + symbol_ids[sym]]
+        except KeyError as e:
+            raise ValueError(f'Символа {e.args[0]} нет в допустимом алфавите!')
+        return self.finals[offset // self.columns_cnt]
+
+    def match_tags(self, word: str) -> FrozenSet[int]:
+        """
+        Номера шаблонов, которым соответствует слово (для автомата из generate_multi_min_dka)
+        """
+        table, symbol_ids = self.table, self.symbol_ids
+        offset = self.start * self.columns_cnt
+        try:
+            for sym in word:
+                offset = table[offset + symbol_ids[sym]]
+        except KeyError as e:
+            raise ValueError(f'Символа {e.args[0]} нет в допустимом алфавите!')
+        return self.tags[offset // self.columns_cnt]
+
+    def match_many(self, words: Iterable[str]) -> List[bool]:
+        """
+        Проверка набора слов, результат -- список в том же порядке
+        """
+        table, symbol_ids, columns_cnt, finals = self.table, self.symbol_ids, self.columns_cnt, self.finals
+        start_offset = self.start * columns_cnt
+        ans = []
+        for word in words:
+            offset = start_offset
+            try:
+                for sym in word:
+                    offset = table[offset + symbol_ids[sym]]
+            except KeyError as e:
+                raise ValueError(f'Символа {e.args[0]} нет в допустимом алфавите!')
+            ans.append(finals[offset // columns_cnt])
+        return ans
+
+
+class DKAStream:
+    """
+    Возобновляемая проверка слова, которое подается частями (строки из сокета, блоки большого файла и т.п.)
+    """
+
+    def __init__(self, dka: CompiledDKA):
+        self.dka = dka
+        self.offset = dka.start * dka.columns_cnt
+        self.consumed = 0  # Сколько символов прочитано
+
+    @property
+    def state(self) -> int:
+        return self.offset // self.dka.columns_cnt
+
+    @property
+    def is_accepting(self) -> bool:
+        """
+        Допускается ли прочитанный к этому моменту префикс
+        """
+        return self.dka.finals[self.state]
+
+    def feed(self, chunk: Union[str, bytes, bytearray, memoryview]) -> 'DKAStream':
+        """
+        Чтение очередной части слова; байты b интерпретируются как символы chr(b)
+        Часть с символом не из алфавита отклоняется целиком: ValueError, состояние и consumed не меняются
+        """
+        table = self.dka.table
+        offset = self.offset
+        if isinstance(chunk, str):
+            symbol_ids = self.dka.symbol_ids
+            try:
+                for sym in chunk:
+                    offset = table[offset + symbol_ids[sym]]
+            except KeyError as e:
+                raise ValueError(f'Символа {e.args[0]} нет в допустимом алфавите!')
+        else:
+            byte_ids = self.dka.byte_ids
+            try:
+                for b in chunk:
+                    offset = table[offset + byte_ids[b]]
+            except TypeError:  # byte_ids[b] is None
+                raise ValueError(f'Символа {chr(b)} нет в допустимом алфавите!')
+        self.offset = offset
+        self.consumed += len(chunk)
+        return self
+
+    def finish(self) -> bool:
+        """
+        Конец ввода: допускается ли слово целиком
+        """
+        return self.is_accepting
+
+    def reset(self):
+        self.offset = self.dka.start * self.dka.columns_cnt
+        self.consumed = 0
+
+
+class PrefixScanner:
+    """
+    Самые длинные префиксы text[pos:], допускаемые ДКА, для неубывающих pos (токены лексера, вхождения при поиске)
+    Чтение префикса останавливается в тупиковом состоянии, но хвост за концом префикса все равно может быть
+    длинным (a*b на a...a). Поэтому пары (позиция, состояние) из хвоста запоминаются: финальное состояние
+    из них по этому тексту не достижимо, и следующий поиск на такой паре останавливается (мемоизация Репса).
+    Если каждый следующий pos не меньше конца предыдущего префикса, каждая пара проходится не больше одного
+    раза, и весь текст обрабатывается за O(len(text) * states_cnt), а не за O(len(text)^2)
+    """
+
+    def __init__(self, dka: CompiledDKA, text: str):
+        self.dka = dka
+        self.text = text
+        self.__tables = (dka.symbol_ids, dka.table, dka.columns_cnt, dka.finals, dka.dead_states, dka.states_cnt)
+        self.__start_end = (0, dka.start) if dka.finals[dka.start] else (-1, -1)  # (сдвиг конца от pos, состояние)
+        self.__failed = set()  # Ключи пар позиция * states_cnt + состояние
+        self.__reached = 0  # Пары в failed есть только для позиций не дальше этой
+
+    def longest_prefix(self, pos: int) -> Tuple[int, int]:
+        """
+        :return: (конец префикса, состояние после него) или (-1, -1), если подходящего префикса нет
+        """
+        text = self.text
+        symbol_ids, table, columns_cnt, finals, dead, states_cnt = self.__tables
+        failed, reached = self.__failed, self.__reached
+        start = self.dka.start
+        offset = start * columns_cnt
+        shift, end_state = self.__start_end
+        end = pos + shift if shift >= 0 else -1
+        stop = len(text)
+        for i in range(pos, stop):
+            column = symbol_ids.get(text[i])
+            if column is None:
+                stop = i
+                break
+            offset = table[offset + column]
+            state = offset // columns_cnt
+            if dead[state] or (i < reached and (i + 1) * states_cnt + state in failed):
+                stop = i
+                break
+            if finals[state]:
+                end, end_state = i + 1, state
+        # Хвост после конца префикса перечитывается еще раз, чтобы не запоминать пары на каждом символе
+        tail_start = end if end >= 0 else pos
+        if stop > tail_start:
+            offset = (end_state if end >= 0 else start) * columns_cnt
+            for i in range(tail_start, stop):
+                offset = table[offset + symbol_ids[text[i]]]
+                failed.add((i + 1) * states_cnt + offset // columns_cnt)
+            if stop > reached:
+                self.__reached = stop
+        return end, end_state
@@ -0,0 +1,66 @@
+from itertools import chain
+from typing import List, FrozenSet, Union
+from regexp_process import RegexpToken, RegexpNode, iter_postfix
+from FSM import FiniteStateMachineNode, NKA, MinDFSMState, generate_nfsm_from_pregexp, symbol_classes, \
+    expand_symbol_classes, subset_construction, hopcroft_partition, mask_to_states
+
+
+def generate_multi_min_dka(pregexps: List[Union[List[RegexpToken], RegexpNode]],
+                           alphabet: List[str]) -> List[MinDFSMState]:
+    """
+    Один минимальный ДКА для набора регулярок
+    НКА шаблонов объединяются общим начальным состоянием, у каждого шаблона свое финальное состояние;
+    состояние ДКА помечается номерами шаблонов, чьи финальные состояния в него входят, а минимизация
+    различает состояния с разными наборами меток. Одного прохода по слову хватает, чтобы узнать все подходящие шаблоны
+    :param pregexps: Постфиксные регулярки или синтаксические деревья, номер шаблона -- индекс в списке
+    :param alphabet: Допустимый алфавит
+    :return: Минимальный ДКА, у состояний заполнены tags
+    """
+    if len(pregexps) == 0:
+        raise ValueError('Нужен хотя бы один шаблон')
+    pregexps = [list(iter_postfix(x)) if isinstance(x, RegexpNode) else x for x in pregexps]
+    symbol_map = symbol_classes(list(chain.from_iterable(pregexps)), alphabet)
+    classes_alphabet = list(dict.fromkeys(symbol_map.values()))
+
+    root = FiniteStateMachineNode(state='s')
+    end_states = []
+    for pregexp in pregexps:
+        nka = generate_nfsm_from_pregexp(pregexp, alphabet, symbol_map)
+        root.outputs_append(nka.root_state)
+        end_states.append(nka.end_state)
+    nfsm = NKA(root_state=root, end_state=end_states[0]).get_as_compact(classes_alphabet, end_states)
+
+    masks, transitions = subset_construction(nfsm, len(classes_alphabet))
+    tag_of = {final: i for i, final in enumerate(nfsm.finals)}
+    final_mask = nfsm.final_mask
+    labels = [tuple(sorted(tag_of[x] for x in mask_to_states(mask & final_mask))) for mask in masks]
+    block_of = hopcroft_partition(transitions, labels)
+
+    representatives = {}
+    for state, block_id in enumerate(block_of):
+        representatives.setdefault(block_id, state)
+    min_dka = []
+    for block_id in range(len(representatives)):
+        tags = labels[representatives[block_id]]
+        min_dka.append(MinDFSMState(state=f'{block_id}{"s" if block_id == block_of[0] else ""}', dka_states=set(),
+                                    is_final=len(tags) > 0, tags=frozenset(tags)))
+    for block_id, state in enumerate(min_dka):
+        row = transitions[representatives[block_id]]
+        state.outputs = [(min_dka[block_of[to_state]].state, classes_alphabet[sym_id])
+                         for sym_id, to_state in enumerate(row)]
+    return expand_symbol_classes(min_dka, symbol_map, alphabet)
+
+
+def multi_dka_job(dka: List[MinDFSMState], word: str) -> FrozenSet[int]:
+    """
+    Номера шаблонов, которым соответствует слово
+    """
+    states = {x.state: x for x in dka}
+    cur_state = [x for x in dka if x.is_start_state()][0]
+    for sym in word:
+        try:
+            state_to_go = [x[0] for x in cur_state.outputs if x[1] == sym][0]
+        except IndexError:
+            raise ValueError(f'Символа {sym} нет в допустимом алфавите!')
+        cur_state = states[state_to_go]
+    return cur_state.tags
@@ -0,0 +1,137 @@
+from array import array
+from typing import List, Dict, Iterable, Optional, Tuple
+from regexp_process import parse_regexp
+from FSM import NKA, CaptureSave, generate_nfsm_from_pregexp
+
+
+Span = Optional[Tuple[int, int]]
+
+
+class SparseSet:
+    """
+    Множество номеров 0..n-1 с порядком добавления (Бриггс, Торчон): dense -- элементы по порядку, sparse[x] --
+    позиция x в dense. Очистка за O(1), память выделяется один раз
+    """
+
+    def __init__(self, n: int):
+        self.dense = array('i', [0]) * n
+        self.sparse = array('i', [0]) * n
+        self.values = [None] * n  # Значение (позиции групп) для элемента dense[i]
+        self.size = 0
+
+    def __contains__(self, x: int) -> bool:
+        i = self.sparse[x]
+        return i < self.size and self.dense[i] == x
+
+    def add(self, x: int, value):
+        self.dense[self.size] = x
+        self.sparse[x] = self.size
+        self.values[self.size] = value
+        self.size += 1
+
+    def clear(self):
+        self.size = 0
+
+
+class PikeVM:
+    """
+    Моделирование НКА Томпсона без построения ДКА (Pike VM): набор потоков -- состояний НКА, в которые можно
+    попасть по прочитанному префиксу, каждый со своими позициями групп. Потоки хранятся в порядке приоритета
+    (альтернатива -- левая ветка раньше, повторение -- жадно), из двух потоков в одном состоянии остается
+    более приоритетный, поэтому проверка слова длины n занимает O(n * m) для НКА из m состояний,
+    а позиции групп совпадают с тем, что дал бы перебор с возвратами (кроме пустых повторений вложенных
+    звездочек: ((a)*)* на "a" модуль re дает группе 1 пустое последнее повторение, здесь его нет)
+    """
+
+    def __init__(self, nka: NKA, alphabet: List[str]):
+        """
+        :param nka: НКА (результат generate_nfsm_from_pregexp, для групп -- с captures=True)
+        :param alphabet: Допустимый алфавит
+        """
+        self.alphabet_set = set(alphabet)
+        ids = {nka.root_state: 0}
+        order = [nka.root_state]
+        self.__eps: List[List[Tuple[int, int]]] = []  # (куда, слот или -1) в порядке приоритета
+        self.__moves: List[Dict[str, int]] = []
+        slots_cnt = 2
+        for node in order:  # order растет по ходу обхода
+            eps, moves = [], {}
+            for nd, sym in node.outputs:
+                try:
+                    nd_id = ids[nd]
+                except KeyError:
+                    nd_id = ids[nd] = len(order)
+                    order.append(nd)
+                if isinstance(sym, CaptureSave):
+                    eps.append((nd_id, sym.slot))
+                    slots_cnt = max(slots_cnt, sym.slot + 1)
+                elif sym == 'eps':
+                    eps.append((nd_id, -1))
+                else:
+                    moves.setdefault(sym, nd_id)
+            self.__eps.append(eps)
+            self.__moves.append(moves)
+        self.final = ids[nka.end_state]
+        self.groups_cnt = slots_cnt // 2 - 1
+        self.__no_captures = (-1, ) * (2 * (self.groups_cnt + 1))
+        self.__lists = (SparseSet(len(order)), SparseSet(len(order)))
+        self.__stack = []
+
+    @classmethod
+    def from_regexp(cls, regexp: str, alphabet: List[str]) -> 'PikeVM':
+        """
+        PikeVM для регулярки со скобками-группами (нумерация групп с 1, по открывающим скобкам)
+        """
+        return cls(generate_nfsm_from_pregexp(parse_regexp(regexp, alphabet), alphabet, captures=True), alphabet)
+
+    def __add_thread(self, threads: SparseSet, state: int, captures: Tuple[int, ...], pos: int):
+        """
+        Добавление потока и всех потоков, достижимых из него по eps-переходам, в порядке приоритета
+        """
+        stack = self.__stack
+        stack.append((state, captures))
+        while len(stack) > 0:
+            state, captures = stack.pop()
+            if state in threads:
+                continue
+            threads.add(state, captures)
+            eps = self.__eps[state]
+            for i in range(len(eps) - 1, -1, -1):  # Первый переход должен попасть на вершину стека
+                to_state, slot = eps[i]
+                if slot >= 0:
+                    stack.append((to_state, captures[:slot] + (pos, ) + captures[slot+1:]))
+                else:
+                    stack.append((to_state, captures))
+
+    def match(self, word: str) -> Optional[List[Span]]:
+        """
+        Проверка всего слова
+        :return: None, если слово не подходит, иначе границы групп (начало, конец): 0 -- все слово,
+            i -- i-я скобка (последнее повторение), None -- группа не участвовала в совпадении
+        """
+        clist, nlist = self.__lists
+        moves = self.__moves
+        clist.clear()
+        self.__add_thread(clist, 0, self.__no_captures, 0)
+        for pos, sym in enumerate(word):
+            if sym not in self.alphabet_set:
+                raise ValueError(f'Символа {sym} нет в допустимом алфавите!')
+            nlist.clear()
+            for i in range(clist.size):
+                to_state = moves[clist.dense[i]].get(sym)
+                if to_state is not None:
+                    self.__add_thread(nlist, to_state, clist.values[i], pos + 1)
+            clist, nlist = nlist, clist
+            if clist.size == 0:
+                return None
+        if self.final not in clist:
+            return None
+        captures = clist.values[clist.sparse[self.final]]
+        spans = [(0, len(word))]
+        for i in range(1, self.groups_cnt + 1):
+            start, end = captures[2 * i], captures[2 * i + 1]
+            spans.append((start, end) if start >= 0 and end >= 0 else None)
+        return spans
+
+    def match_many(self, words: Iterable[str]) -> List[Optional[List[Span]]]:
+        return [self.match(word) for word in words]
@@ -1,9 +1,17 @@
-from typing import List
+from typing import List, Iterable, Iterator, Union
 
 
 # TEST_ALPHABET = [chr(x) for x in range(ord('a'), ord('z')+1)] + [chr(x) for x in range(ord('A'), ord('Z')+1)] + \
 #                 [str(x) for x in range(10)]
 TEST_ALPHABET = ['a', 'b']
+LATIN_ALPHABET = [chr(x) for x in range(ord('a'), ord('z')+1)] + [chr(x) for x in range(ord('A'), ord('Z')+1)] + \
+                 [str(x) for x in range(10)]
+BYTE_ALPHABET = [chr(x) for x in range(256)]
+ALPHABETS = {
+    'test': TEST_ALPHABET,
+    'latin': LATIN_ALPHABET,
+    'byte': BYTE_ALPHABET,
+}
 TEST_OPS_PRECEDENCE = {
     '|': 0,
     '+': 2,
@@ -15,70 +23,304 @@ TEST_OPS_PRECEDENCE = {
 TEST_OPS = list(TEST_OPS_PRECEDENCE.keys())
 ALL_TEST_SYMBOLS = TEST_ALPHABET + TEST_OPS
 CONCAT_OP = TEST_OPS[-1]
+ANY_SYMBOL = '.'  # Во входной регулярке точка -- любой символ алфавита (конкатенация там не пишется)
+SPECIAL_SYMBOLS = set(TEST_OPS) | {'[', ']', '\\'}
 
 
 class RegexpError(Exception):
     def __init__(self, message: str):
+        super().__init__(message)  # args нужны для pickle (ошибка из процесса пула)
         self.message = message
 
     def __str__(self):
         return self.message
 
 
-def get_postfix_regexp(regexp: str) -> List[str]:
-    return __create_postfix_notation_regexp(__normalize_regexp(regexp))
+class SymbolClass:
+    """
+    Класс символов ([a-z], [^ab], ., экранированный символ): в постфиксной записи это один операнд
+    """
+
+    def __init__(self, symbols: Iterable[str], text: str):
+        """
+        :param symbols: Символы класса
+        :param text: Запись класса в регулярке
+        """
+        self.symbols = frozenset(symbols)
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return str(self)
+
+    def __eq__(self, other):
+        return isinstance(other, SymbolClass) and self.symbols == other.symbols
+
+    def __hash__(self):
+        return hash(self.symbols)
+
+
+RegexpToken = Union[str, SymbolClass]
 
 
-def __normalize_regexp(regexp: str) -> str:
+class CaptureGroup:
+    """
+    Постфиксная операция "выражение на вершине стека -- скобка номер index" (см. iter_postfix(..., captures=True))
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+
+    def __str__(self):
+        return f'({self.index})'
+
+    def __repr__(self):
+        return str(self)
+
+
+# MARK: - AST
+
+class RegexpNode:
+    """
+    Узел синтаксического дерева регулярки
     """
-    Добавление знака конкатенации к регулярке
+    children = ()
+
+
+class RegexpSymbol(RegexpNode):
+    """
+    Операнд: символ алфавита или SymbolClass
+    """
+
+    def __init__(self, symbol: RegexpToken):
+        self.symbol = symbol
+
+
+class RegexpConcat(RegexpNode):
+    def __init__(self, children: List[RegexpNode]):
+        self.children = children
+
+
+class RegexpUnion(RegexpNode):
+    def __init__(self, children: List[RegexpNode]):
+        self.children = children
+
+
+class RegexpStar(RegexpNode):
+    def __init__(self, child: RegexpNode):
+        self.children = [child]
+
+
+class RegexpPlus(RegexpNode):
+    def __init__(self, child: RegexpNode):
+        self.children = [child]
+
+
+class RegexpGroup(RegexpNode):
+    """
+    Выражение в скобках, index -- номер скобки (с 1, по порядку открывающих скобок)
+    """
+
+    def __init__(self, child: RegexpNode, index: int):
+        self.children = [child]
+        self.index = index
+
+
+def parse_regexp(regexp: str, alphabet: List[str] = None) -> RegexpNode:
+    """
+    Разбор регулярки в синтаксическое дерево за один проход (без рекурсии, поэтому глубина скобок не ограничена)
+    Конкатенация и альтернатива -- n-арные узлы
     :param regexp: Регулярка
-    :return: Регулярка со знаками конкатенации
-    """
-    nregexp = ''
-    for i in range(len(regexp)-1):
-        if regexp[i] not in ALL_TEST_SYMBOLS:
-            raise RegexpError(message=f'Неизвестный символ "{regexp[i]}"')
-        nregexp += regexp[i]
-        if regexp[i] in TEST_ALPHABET + ['*', '+', ')'] and regexp[i+1] in TEST_ALPHABET + ['(']:
-            nregexp += CONCAT_OP
-    if regexp[-1] not in ALL_TEST_SYMBOLS:
-        raise RegexpError(message=f'Неизвестный символ "{regexp[-1]}"')
-    nregexp += regexp[-1]
-    return nregexp
-
-
-def __create_postfix_notation_regexp(normalized_regexp: str) -> List[str]:
-    """
-    Перевод регекспа из инфиксной записи в постфиксную
-    :param normalized_regexp: Регулярка с символами конкатенации
-    :return: Постфиксная нотация регекспа
-    """
-    queue = []
-    stack = []
-    while len(normalized_regexp) != 0:
-        sym = normalized_regexp[0]
-        normalized_regexp = normalized_regexp[1:]
-        if sym in TEST_ALPHABET:
-            queue.append(sym)
-        elif sym == '(':
-            stack.append('(')
-        elif sym == ')':
-            while len(stack) > 0 and stack[-1] != '(':
-                queue.append(stack.pop())
-            try:
-                stack.pop()
-            except IndexError:
+    :param alphabet: Допустимый алфавит (по умолчанию TEST_ALPHABET)
+    :return: Корень дерева
+    """
+    alphabet = TEST_ALPHABET if alphabet is None else alphabet
+    # Для корня и каждой открытой скобки: [уже прочитанные альтернативы, текущая конкатенация, номер скобки]
+    frames = [[[], [], 0]]
+    groups_cnt = 0
+    for token in __tokenize_regexp(regexp, alphabet):
+        frame = frames[-1]
+        if is_operand(token):
+            frame[1].append(RegexpSymbol(token))
+        elif token in ('*', '+'):
+            if len(frame[1]) == 0:
+                raise RegexpError(f'Нечего повторять: "{token}"')
+            frame[1][-1] = RegexpStar(frame[1][-1]) if token == '*' else RegexpPlus(frame[1][-1])
+        elif token == '|':
+            frame[0].append(__make_concat(frame[1]))
+            frame[1] = []
+        elif token == '(':
+            groups_cnt += 1
+            frames.append([[], [], groups_cnt])
+        elif token == ')':
+            if len(frames) == 1:
                 raise RegexpError('Не хватает открывающей скобки')
-        elif sym in TEST_OPS:
-            while len(stack) > 0 and TEST_OPS_PRECEDENCE[stack[-1]] >= TEST_OPS_PRECEDENCE[sym]:
-                queue.append(stack.pop())
-            stack.append(sym)
-        else:
-            raise RegexpError('Неизвестный символ в построении постфиксной формы')
+            alternatives, concat, index = frames.pop()
+            alternatives.append(__make_concat(concat))
+            frames[-1][1].append(RegexpGroup(__make_union(alternatives), index))
+        else:  # Явная конкатенация во входной регулярке не пишется
+            raise RegexpError(f'Неизвестный символ "{token}"')
+    if len(frames) > 1:
+        raise RegexpError('Не хватает закрывающей скобки')
+    alternatives, concat, _ = frames[0]
+    alternatives.append(__make_concat(concat))
+    return __make_union(alternatives)
+
+
+def __make_concat(nodes: List[RegexpNode]) -> RegexpNode:
+    if len(nodes) == 0:
+        raise RegexpError('Пустое выражение в альтернативе или скобках')
+    return nodes[0] if len(nodes) == 1 else RegexpConcat(nodes)
+
+
+def __make_union(nodes: List[RegexpNode]) -> RegexpNode:
+    return nodes[0] if len(nodes) == 1 else RegexpUnion(nodes)
+
+
+def iter_postfix(root: RegexpNode, captures: bool = False) -> Iterator[Union[RegexpToken, CaptureGroup]]:
+    """
+    Постфиксная запись дерева (лениво, без рекурсии); n-арные узлы раскладываются левоассоциативно: ab.c.
+    :param captures: Выдавать CaptureGroup после каждой скобки (для запоминания границ групп)
+    """
+    stack = [(root, 0)]
     while len(stack) > 0:
-        stack_sym = stack.pop()
-        if stack_sym == '(':
-            raise RegexpError('Не хватает закрывающей скобки')
-        queue.append(stack_sym)
-    return queue
+        node, i = stack.pop()
+        if i >= 2:  # Закончили i-го потомка конкатенации или альтернативы
+            yield CONCAT_OP if isinstance(node, RegexpConcat) else '|'
+        if i < len(node.children):
+            stack.append((node, i + 1))
+            stack.append((node.children[i], 0))
+        elif isinstance(node, RegexpSymbol):
+            yield node.symbol
+        elif isinstance(node, RegexpStar):
+            yield '*'
+        elif isinstance(node, RegexpPlus):
+            yield '+'
+        elif captures and isinstance(node, RegexpGroup):
+            yield CaptureGroup(node.index)
+
+
+def reverse_regexp(pregexp: Union[List[RegexpToken], RegexpNode]) -> RegexpNode:
+    """
+    Дерево регулярки для перевернутого языка: допускает слово w тогда и только тогда, когда исходная допускает w[::-1]
+    Операнды конкатенации меняются местами, остальное сохраняется; скобки-группы не переносятся
+    :param pregexp: Постфиксная запись или синтаксическое дерево
+    """
+    tokens = iter_postfix(pregexp) if isinstance(pregexp, RegexpNode) else pregexp
+    stack: List[RegexpNode] = []
+    for token in tokens:
+        if is_operand(token):
+            stack.append(RegexpSymbol(token))
+        elif token in ('*', '+'):
+            stack.append(RegexpStar(stack.pop()) if token == '*' else RegexpPlus(stack.pop()))
+        elif token in (CONCAT_OP, '|'):
+            right, left = stack.pop(), stack.pop()
+            stack.append(RegexpConcat([right, left]) if token == CONCAT_OP else RegexpUnion([left, right]))
+    return stack.pop()
+
+
+# MARK: - Postfix
+
+def get_postfix_regexp(regexp: str, alphabet: List[str] = None) -> List[RegexpToken]:
+    """
+    :param regexp: Регулярка
+    :param alphabet: Допустимый алфавит (по умолчанию TEST_ALPHABET)
+    :return: Постфиксная запись: символы алфавита, SymbolClass и операции из TEST_OPS
+    """
+    return list(iter_postfix(parse_regexp(regexp, alphabet)))
+
+
+def is_operand(token: RegexpToken) -> bool:
+    if isinstance(token, CaptureGroup):
+        return False
+    return isinstance(token, SymbolClass) or token not in TEST_OPS_PRECEDENCE
+
+
+def __literal_token(sym: str, text: str) -> RegexpToken:
+    """
+    Символ алфавита, совпадающий с операцией, заворачивается в SymbolClass, чтобы не спутать его с операцией
+    """
+    return SymbolClass([sym], text) if sym in TEST_OPS_PRECEDENCE else sym
+
+
+def __tokenize_regexp(regexp: str, alphabet: List[str]) -> Iterator[RegexpToken]:
+    """
+    Разбиение регулярки на операции и операнды (символы и классы символов)
+    :param regexp: Регулярка
+    :param alphabet: Допустимый алфавит
+    :return: Токены по одному
+    """
+    if len(regexp) == 0:
+        raise RegexpError(message='Пустое выражение')
+    alphabet_set = set(alphabet)
+    i = 0
+    while i < len(regexp):
+        sym = regexp[i]
+        if sym == '\\':
+            if i + 1 == len(regexp) or regexp[i+1] not in alphabet_set:
+                raise RegexpError(message='Экранировать можно только символ алфавита')
+            yield __literal_token(regexp[i+1], regexp[i:i+2])
+            i += 2
+        elif sym == '[':
+            cls, i = __read_symbol_class(regexp, i, alphabet, alphabet_set)
+            yield cls
+        elif sym == ANY_SYMBOL:
+            yield SymbolClass(alphabet, ANY_SYMBOL)
+            i += 1
+        elif sym in TEST_OPS_PRECEDENCE:
+            yield sym
+            i += 1
+        elif sym in alphabet_set and sym not in SPECIAL_SYMBOLS:
+            yield sym
+            i += 1
+        else:
+            raise RegexpError(message=f'Неизвестный символ "{sym}"')
+
+
+def __read_symbol_class(regexp: str, i: int, alphabet: List[str], alphabet_set: set):
+    """
+    Чтение класса символов [...] начиная с позиции i (там стоит '[')
+    Поддерживаются диапазоны a-z (по порядку символов в алфавите), отрицание [^...] и экранирование \\x
+    :return: Класс символов и позиция после ']'
+    """
+    start = i
+    i += 1
+    negate = i < len(regexp) and regexp[i] == '^'
+    if negate:
+        i += 1
+    members = []
+    while True:
+        if i >= len(regexp):
+            raise RegexpError(message='Не хватает закрывающей квадратной скобки')
+        if regexp[i] == ']':
+            break
+        sym, i = __read_class_symbol(regexp, i, alphabet_set)
+        if i + 1 < len(regexp) and regexp[i] == '-' and regexp[i+1] != ']':
+            last, i = __read_class_symbol(regexp, i + 1, alphabet_set)
+            lo, hi = alphabet.index(sym), alphabet.index(last)
+            if lo > hi:
+                raise RegexpError(message=f'Неверный диапазон "{sym}-{last}"')
+            members.extend(alphabet[lo:hi+1])
+        else:
+            members.append(sym)
+    i += 1
+    if negate:
+        excluded = set(members)
+        members = [x for x in alphabet if x not in excluded]
+    if len(members) == 0:
+        raise RegexpError(message=f'Пустой класс символов "{regexp[start:i]}"')
+    return SymbolClass(members, regexp[start:i]), i
+
+
+def __read_class_symbol(regexp: str, i: int, alphabet_set: set):
+    sym = regexp[i]
+    if sym == '\\':
+        if i + 1 == len(regexp):
+            raise RegexpError(message='Не хватает закрывающей квадратной скобки')
+        sym = regexp[i+1]
+        i += 1
+    if sym not in alphabet_set:
+        raise RegexpError(message=f'Неизвестный символ "{sym}"')
+    return sym, i + 1
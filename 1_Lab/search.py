@@ -0,0 +1,75 @@
+from typing import List, Iterator, Optional, Tuple, Union
+from regexp_process import RegexpNode, RegexpToken, RegexpConcat, RegexpStar, RegexpSymbol, SymbolClass, ANY_SYMBOL, \
+    parse_regexp, reverse_regexp
+from FSM import generate_min_dka_from_pregexp
+from matcher import CompiledDKA, PrefixScanner
+
+
+Span = Tuple[int, int]
+
+
+class Searcher:
+    """
+    Поиск вхождений регулярки R в тексте: самое левое начало, при нем самый длинный конец (как в POSIX),
+    следующее вхождение ищется после конца предыдущего
+    Начала всех вхождений находятся за один проход справа налево по ДКА для .*rev(R): после чтения text[i:]
+    с конца автомат в финальном состоянии ровно тогда, когда какая-то подстрока text[i:j] допускается R.
+    Концы ищутся проходом слева направо по ДКА для R только от найденных начал (PrefixScanner): хвост,
+    прочитанный за концом вхождения, запоминается как пары (позиция, состояние), из которых финальное
+    не достижимо, и следующее вхождение его не перечитывает. Поэтому весь текст обрабатывается
+    за O(len(text) * число состояний) даже для a|a*b на a...a, где начало -- каждая позиция
+    Символы не из алфавита допустимы в тексте, но в вхождения не попадают
+    """
+
+    def __init__(self, pregexp: Union[List[RegexpToken], RegexpNode], alphabet: List[str]):
+        """
+        :param pregexp: Постфиксная запись или синтаксическое дерево регулярки
+        :param alphabet: Допустимый алфавит
+        """
+        self.forward = CompiledDKA.from_min_dka(generate_min_dka_from_pregexp(pregexp, alphabet))
+        any_prefix = RegexpStar(RegexpSymbol(SymbolClass(alphabet, ANY_SYMBOL)))
+        self.backward = CompiledDKA.from_min_dka(
+            generate_min_dka_from_pregexp(RegexpConcat([any_prefix, reverse_regexp(pregexp)]), alphabet))
+
+    @classmethod
+    def from_regexp(cls, regexp: str, alphabet: List[str]) -> 'Searcher':
+        return cls(parse_regexp(regexp, alphabet), alphabet)
+
+    def match_starts(self, text: str) -> bytearray:
+        """
+        Начала вхождений: starts[i] == 1, если какая-то подстрока text[i:j] допускается (i от 0 до len(text))
+        """
+        dka = self.backward
+        symbol_ids, table, columns_cnt, finals = dka.symbol_ids, dka.table, dka.columns_cnt, dka.finals
+        start_offset = dka.start * columns_cnt
+        starts = bytearray(len(text) + 1)
+        starts[len(text)] = finals[dka.start]
+        offset = start_offset
+        for i in range(len(text) - 1, -1, -1):
+            column = symbol_ids.get(text[i])
+            # Через символ не из алфавита вхождение не проходит: начинаем заново с пустого суффикса
+            offset = start_offset if column is None else table[offset + column]
+            starts[i] = finals[offset // columns_cnt]
+        return starts
+
+    def finditer(self, text: str) -> Iterator[Span]:
+        """
+        Непересекающиеся вхождения (начало, конец) слева направо; пустое вхождение сразу после
+        непустого допускается, как в re.finditer
+        """
+        starts = self.match_starts(text)
+        scanner = PrefixScanner(self.forward, text)
+        pos = starts.find(1)
+        while pos >= 0:
+            end, _ = scanner.longest_prefix(pos)
+            yield pos, end
+            pos = starts.find(1, end if end > pos else pos + 1)
+
+    def find_all(self, text: str) -> List[Span]:
+        return list(self.finditer(text))
+
+    def search(self, text: str) -> Optional[Span]:
+        """
+        Первое вхождение или None
+        """
+        return next(self.finditer(text), None)
@@ -1,5 +1,21 @@
-from regexp_process import get_postfix_regexp, TEST_ALPHABET
-from FSM import generate_min_dka_from_pregexp, dka_job
+import contextlib
+import io
+import tempfile
+from regexp_process import get_postfix_regexp, parse_regexp, TEST_ALPHABET, BYTE_ALPHABET, LATIN_ALPHABET
+from FSM import generate_min_dka_from_pregexp, generate_nfsm_from_pregexp, dka_job, dka_job_batch, draw_dka_gz, \
+    CompileStats, symbol_classes
+from lazy_dka import LazyDKA
+from compile_cache import CompileCache, compile_many
+from multi_dka import generate_multi_min_dka, multi_dka_job
+from matcher import CompiledDKA
+from lexer import Lexer, LexerError
+from words_dka import generate_min_dka_from_words, compile_words
+from pike_vm import PikeVM
+from batch import match_batch, main as batch_main
+from equivalence import find_difference, find_inclusion_counterexample, is_equivalent
+from search import Searcher
+from codegen import compile_matcher
+from fuzz import fuzz, find_regressions
 
 
 if __name__ == '__main__':
@@ -45,4 +61,252 @@ if __name__ == '__main__':
     assert not dka_job(min_dka, 'ababb')
     print('Успешно')
 
+    print('Тест скомпилированного ДКА...')
+    compiled = CompiledDKA.from_min_dka(min_dka)
+    test_words = ['a', 'babb', 'b', 'bab', 'ba', '', 'aa', 'ababb']
+    assert compiled.match_many(test_words) == [dka_job(min_dka, x) for x in test_words]
+    assert compiled.match('babb') and not compiled.match('bab')
+    print('Успешно')
+
+    print('Тест потоковой проверки...')
+    assert compiled.stream().feed('ba').feed(b'bb').finish()
+    assert not compiled.match_chunks(['ba', 'b'])
+    stream = compiled.stream().feed('ba')
+    for bad_chunk in ('bx', b'bx'):
+        try:
+            stream.feed(bad_chunk)
+            assert False
+        except ValueError:
+            pass
+        assert stream.consumed == 2 and stream.state == compiled.stream().feed('ba').state  # Часть отклонена целиком
+    assert stream.feed('bb').finish()
+    star_compiled = CompiledDKA.from_min_dka(generate_min_dka_from_pregexp(get_postfix_regexp('(ab)*'), TEST_ALPHABET))
+    with tempfile.TemporaryDirectory() as files_dir:
+        for name, data in (('empty', b''), ('babb', b'babb'), ('long', b'ab' * 5000), ('bad', b'abx')):
+            with open(f'{files_dir}/{name}', 'wb') as f:
+                f.write(data)
+        assert not compiled.match_file(f'{files_dir}/empty') and star_compiled.match_file(f'{files_dir}/empty')
+        assert compiled.match_file(f'{files_dir}/babb') and compiled.match_file(f'{files_dir}/babb', chunk_size=1)
+        assert star_compiled.match_file(f'{files_dir}/long', chunk_size=7)  # Блоки делят пары ab пополам
+        assert not compiled.match_file(f'{files_dir}/long', chunk_size=7)
+        try:
+            star_compiled.match_file(f'{files_dir}/bad', chunk_size=2)
+            assert False
+        except ValueError:
+            pass
+    print('Успешно')
+
+    print('Тест ленивого ДКА с маленьким кэшем...')
+    lazy = LazyDKA(generate_nfsm_from_pregexp(postfix_regexp, TEST_ALPHABET), TEST_ALPHABET, max_states=3)
+    assert lazy.match_many(test_words) == [dka_job(min_dka, x) for x in test_words]
+    assert lazy.flushes > 0 and lazy.cached_states_cnt <= 3
+    print('Успешно')
+
+    print('Тест пакетной проверки на NumPy...')
+    try:
+        assert list(dka_job_batch(min_dka, test_words)) == [dka_job(min_dka, x) for x in test_words]
+        print('Успешно')
+    except ImportError:
+        print('Пропущен: NumPy не установлен')
+
+    print('Тест кэша автоматов...')
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = CompileCache(max_size=1, cache_dir=cache_dir)
+        cache.compile(test_regexp, TEST_ALPHABET)
+        assert cache.compile(test_regexp, TEST_ALPHABET) is cache.compile(test_regexp, TEST_ALPHABET)
+        assert (cache.misses, cache.hits) == (1, 2)
+        warm_cache = CompileCache(cache_dir=cache_dir)
+        cached_dka = warm_cache.compile(test_regexp, TEST_ALPHABET)
+        assert (warm_cache.misses, warm_cache.disk_hits) == (0, 1)
+        assert [dka_job(cached_dka, x) for x in test_words] == [dka_job(min_dka, x) for x in test_words]
+    print('Успешно')
+
+    print('Тест классов символов над байтовым алфавитом...')
+    class_dka = CompiledDKA.from_min_dka(generate_min_dka_from_pregexp(
+        get_postfix_regexp('[a-c]+x.\\*', BYTE_ALPHABET), BYTE_ALPHABET))
+    assert class_dka.match('abxz*') and class_dka.match('cx.*')
+    assert not class_dka.match('dxz*') and not class_dka.match('abx*')
+    assert class_dka.columns_cnt == 4  # [a-c], x, *, остальные
+    for class_regexp in ('abc', 'ab*|c+'):  # Операции . | * + не дают своих классов: a, b, c и остальные
+        assert len(set(symbol_classes(get_postfix_regexp(class_regexp, BYTE_ALPHABET), BYTE_ALPHABET).values())) == 4
+    print('Успешно')
+
+    print('Тест автомата для нескольких регулярок...')
+    patterns = [test_regexp, 'b*', '(a|b)*abb']
+    multi_dka = generate_multi_min_dka([get_postfix_regexp(x) for x in patterns], TEST_ALPHABET)
+    single_dkas = [generate_min_dka_from_pregexp(get_postfix_regexp(x), TEST_ALPHABET) for x in patterns]
+    for word in test_words + ['abb', 'bb', 'aabb']:
+        expected = {i for i, single_dka in enumerate(single_dkas) if dka_job(single_dka, word)}
+        assert multi_dka_job(multi_dka, word) == expected
+        assert CompiledDKA.from_min_dka(multi_dka).match_tags(word) == expected
+    print('Успешно')
+
+    print('Тест построения ДКА по followpos...')
+    for regexp in [test_regexp, '(a|b)*abb', '(ab|b*)+a', '(a*|b)(a|b+)*']:
+        thompson_dka = generate_min_dka_from_pregexp(get_postfix_regexp(regexp), TEST_ALPHABET)
+        followpos_dka = generate_min_dka_from_pregexp(get_postfix_regexp(regexp), TEST_ALPHABET, method='followpos')
+        assert len(followpos_dka) == len(thompson_dka)
+        for word in test_words + ['abb', 'bbabb', 'aba']:
+            assert dka_job(followpos_dka, word) == dka_job(thompson_dka, word)
+    print('Успешно')
+
+    print('Тест ДКА для словаря...')
+    dictionary = sorted(['a', 'ab', 'abb', 'babb', 'bb', 'bbb'])
+    words_dka = generate_min_dka_from_words(dictionary, TEST_ALPHABET)
+    regexp_dka = generate_min_dka_from_pregexp(get_postfix_regexp('|'.join(dictionary)), TEST_ALPHABET)
+    assert len(words_dka) == len(regexp_dka)
+    words_compiled = compile_words(dictionary, TEST_ALPHABET)
+    for word in test_words + dictionary + ['abbb', 'bbbb']:
+        assert dka_job(words_dka, word) == words_compiled.match(word) == (word in dictionary)
+    try:
+        generate_min_dka_from_words(['b', 'a'], TEST_ALPHABET)
+        assert False
+    except ValueError:
+        pass
+    print('Успешно')
+
+    print('Тест PikeVM с группами...')
+    vm = PikeVM.from_regexp('(a|ab)(b*)(a)*', TEST_ALPHABET)
+    assert vm.match('abbb') == [(0, 4), (0, 1), (1, 4), None]
+    assert vm.match('aba') == [(0, 3), (0, 1), (1, 2), (2, 3)]
+    assert vm.match('b') is None
+    pike_vm = PikeVM(generate_nfsm_from_pregexp(postfix_regexp, TEST_ALPHABET), TEST_ALPHABET)
+    assert [x is not None for x in pike_vm.match_many(test_words)] == [dka_job(min_dka, x) for x in test_words]
+    print('Успешно')
+
+    print('Тест пакетной проверки в пуле процессов...')
+    batch_words = test_words * 50 + ['abc']
+    expected = [(x, dka_job(min_dka, x)) for x in test_words * 50] + [('abc', False)]
+    assert list(match_batch(compiled, batch_words, jobs=1, chunk_size=7)) == expected
+    assert list(match_batch(compiled, iter(batch_words), jobs=2, chunk_size=7)) == expected
+    with tempfile.TemporaryDirectory() as words_dir, contextlib.redirect_stderr(io.StringIO()) as batch_err:
+        assert batch_main([test_regexp, f'{words_dir}/missing.txt']) == 1  # Нет файла -- код 1, а не исключение
+    assert 'missing.txt' in batch_err.getvalue()
+    print('Успешно')
+
+    print('Тест выгрузки в DOT...')
+    with tempfile.TemporaryDirectory() as dot_dir:
+        dot_path = f'{dot_dir}/dka_min'
+        draw_dka_gz(min_dka, filename=dot_path, render=False)
+        with open(dot_path) as f:
+            dot = f.read()
+        assert dot.count('->') == sum(len({x for x, _ in state.outputs}) for state in min_dka)  # Ребра склеены
+        assert '"a,b"' in dot
+        draw_dka_gz(min_dka, filename=dot_path, render=False, max_states=2)
+        with open(dot_path) as f:
+            dot = f.read()
+        assert f'... еще {len(min_dka) - 2} состояний' in dot
+    print('Успешно')
+
+    print('Тест статистики построения...')
+    stages = []
+    stats = CompileStats(on_stage=lambda name, t: stages.append(name))
+    stats_dka = generate_min_dka_from_pregexp(postfix_regexp, TEST_ALPHABET, stats=stats)
+    assert stages == ['symbol_classes', 'thompson', 'compact', 'eps_closures', 'subsets', 'hopcroft', 'min_dka',
+                      'expand']
+    assert stats.counters['min_dka_states'] == len(stats_dka) == len(min_dka)
+    assert stats.counters['eps_closures'] == stats.counters['nka_states']
+    assert stats.counters['dka_states'] >= len(stats_dka)
+    stats = CompileStats()
+    generate_min_dka_from_pregexp(postfix_regexp, TEST_ALPHABET, method='followpos', stats=stats)
+    assert stats.counters['nka_states'] == 6  # a, b, a, b, b и концевой маркер
+    assert 'followpos' in stats.times and 'thompson' not in stats.times
+    assert stats.total_time > 0
+    keywords_regexp = '|'.join(x + y + z for x in 'abcdefg' for y in 'abcdefg' for z in 'abcdefg')
+    for keywords_pregexp in (get_postfix_regexp(keywords_regexp, LATIN_ALPHABET),
+                             parse_regexp(keywords_regexp, LATIN_ALPHABET)):
+        stats = CompileStats()
+        keywords_dka = generate_min_dka_from_pregexp(keywords_pregexp, LATIN_ALPHABET, stats=stats)
+        # Одна развилка на 343 ветки, а не цепочка вложенных пар S/F (там было бы O(343^2) eps-переходов)
+        assert stats.counters['eps_edges'] < 3 * len(keywords_regexp)
+        assert dka_job(keywords_dka, 'gfa') and not dka_job(keywords_dka, 'gfh')
+    print('Успешно')
+
+    print('Тест эквивалентности и включения автоматов...')
+    any_word_dka = generate_min_dka_from_pregexp(get_postfix_regexp('(a|b)*'), TEST_ALPHABET)
+    abb_dka = generate_min_dka_from_pregexp(get_postfix_regexp('(a|b)*abb'), TEST_ALPHABET)
+    bb_dka = generate_min_dka_from_pregexp(get_postfix_regexp('(a|b)*bb'), TEST_ALPHABET)
+    assert is_equivalent(any_word_dka, generate_min_dka_from_pregexp(get_postfix_regexp('(a*b*)*'), TEST_ALPHABET))
+    assert find_difference(abb_dka, bb_dka) == 'bb'
+    assert find_difference(min_dka, any_word_dka) == ''
+    assert find_inclusion_counterexample(abb_dka, bb_dka) is None
+    assert find_inclusion_counterexample(bb_dka, abb_dka) == 'bb'
+    print('Успешно')
+
+    print('Тест независимых построений и пакетной компиляции...')
+    first_table = generate_nfsm_from_pregexp(postfix_regexp, TEST_ALPHABET).get_as_table(TEST_ALPHABET)
+    generate_nfsm_from_pregexp(get_postfix_regexp('(a|b)*abb'), TEST_ALPHABET)
+    assert generate_nfsm_from_pregexp(postfix_regexp, TEST_ALPHABET).get_as_table(TEST_ALPHABET) == first_table
+    batch_regexps = [test_regexp, '(a|b)*abb', 'b+a*']
+    for jobs in (1, 2):
+        batch_dka = compile_many(batch_regexps, TEST_ALPHABET, jobs=jobs)
+        for regexp, compiled_dka in zip(batch_regexps, batch_dka):
+            single_dka = generate_min_dka_from_pregexp(get_postfix_regexp(regexp), TEST_ALPHABET)
+            assert compiled_dka.match_many(test_words) == [dka_job(single_dka, x) for x in test_words]
+    print('Успешно')
+
+    print('Тест лексического анализатора...')
+    lexer = Lexer([('if', 'if'), ('id', '[a-z][a-z0-9]*'), ('num', '[0-9]+'), ('rel', '<|<=|>|>=|<>|=='),
+                   ('ws', ' +')], LATIN_ALPHABET + list('<>= '), skip=['ws'])
+    tokens = list(lexer.tokenize('if iff<>x1 <=  42'))
+    assert [(x.name, x.text) for x in tokens] == [('if', 'if'), ('id', 'iff'), ('rel', '<>'), ('id', 'x1'),
+                                                  ('rel', '<='), ('num', '42')]
+    assert tokens[-1].pos == 15
+    prefix_lexer = Lexer([('a', 'a'), ('ab', 'a*b')], TEST_ALPHABET)
+    assert [x.text for x in prefix_lexer.tokenize('aab' + 'a' * 5 + 'b' + 'aa')] == ['aab', 'aaaaab', 'a', 'a']
+    assert len(list(prefix_lexer.tokenize('a' * 3000))) == 3000
+    try:
+        list(lexer.tokenize('x = 1'))
+        assert False
+    except LexerError as e:
+        assert e.pos == 2
+    print('Успешно')
+
+    print('Тест поиска вхождений в тексте...')
+    for regexp in (test_regexp, 'ab*', 'a*', '(a|b)*abb', 'b(ab)+|ba', 'a|a*b'):
+        searcher = Searcher.from_regexp(regexp, TEST_ALPHABET)
+        regexp_dka = generate_min_dka_from_pregexp(get_postfix_regexp(regexp), TEST_ALPHABET)
+        for text in test_words + ['abbabaabba', 'bbacabbab', 'ccc', 'abbcaab' * 3]:
+            expected, pos = [], 0
+            while pos <= len(text):  # Перебор: самое левое начало, при нем самый длинный конец
+                ends = [j for j in range(pos, len(text) + 1)
+                        if set(text[pos:j]) <= set(TEST_ALPHABET) and dka_job(regexp_dka, text[pos:j])]
+                if len(ends) == 0:
+                    pos += 1
+                    continue
+                expected.append((pos, ends[-1]))
+                pos = ends[-1] if ends[-1] > pos else pos + 1
+            assert searcher.find_all(text) == expected, (regexp, text)
+    assert Searcher.from_regexp('ab*', TEST_ALPHABET).search('bbabba') == (2, 5)
+    assert Searcher.from_regexp('ab*', TEST_ALPHABET).search('bbb') is None
+    assert len(Searcher.from_regexp('a|a*b', TEST_ALPHABET).find_all('a' * 3000)) == 3000
+    print('Успешно')
+
+    print('Тест сгенерированного кода проверки...')
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for regexp in (test_regexp, '(a|b)*abb', 'a*', 'b+a*'):
+            regexp_dka = generate_min_dka_from_pregexp(get_postfix_regexp(regexp), TEST_ALPHABET)
+            for matcher_dir in (None, cache_dir, cache_dir):
+                generated_match = compile_matcher(regexp_dka, matcher_dir)
+                assert [generated_match(x) for x in test_words] == [dka_job(regexp_dka, x) for x in test_words]
+        try:
+            generated_match('abc')
+            assert False
+        except ValueError:
+            pass
+    byte_dka = generate_min_dka_from_pregexp(get_postfix_regexp('.*\x00[^a]', BYTE_ALPHABET), BYTE_ALPHABET)
+    generated_match = compile_matcher(byte_dka)
+    assert generated_match('xy\x00b') and not generated_match('\x00a') and generated_match('\x00\xff')
+    print('Успешно')
+
+    print('Тест сравнения с re на случайных регулярках...')
+    fuzz_failures, _ = fuzz(100, TEST_ALPHABET, seed=1)
+    assert fuzz_failures == [], fuzz_failures
+    fuzz_failures, _ = fuzz(20, LATIN_ALPHABET, seed=1)
+    assert fuzz_failures == [], fuzz_failures
+    base_times = {'4': {'compile': 1.0, 'compiled': 1.0}}
+    assert find_regressions({'4': {'compile': 1.4, 'compiled': 2.0}, '16': {'compile': 5.0}}, base_times) == \
+        ['размер 4, compiled: 2.0000 с против 1.0000 с (x2.00)']
+    print('Успешно')
+
     print('Тесты завергились успешно')
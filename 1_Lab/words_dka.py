@@ -0,0 +1,184 @@
+from typing import List, Dict, Iterable, Tuple
+from FSM import MinDFSMState
+from matcher import CompiledDKA
+
+
+class WordsDKABuilder:
+    """
+    Построение минимального ациклического ДКА для словаря по отсортированным словам (алгоритм Дацюка)
+    Пока добавляются слова, незакрепленным остается только путь последнего слова. Следующее слово отличается от него
+    после общего префикса, и хвост пути уже никогда не изменится: его состояния с конца заменяются
+    эквивалентными из реестра (одинаковая финальность и одинаковые переходы) или сами заносятся в реестр.
+    Поэтому в памяти всегда почти минимальный автомат, а номера замененных состояний используются заново
+    """
+
+    def __init__(self, alphabet: List[str]):
+        """
+        :param alphabet: Допустимый алфавит
+        """
+        self.alphabet = list(alphabet)
+        self.__alphabet_set = set(alphabet)
+        self.outputs: List[Dict[str, int]] = [{}]  # Переходы состояния: символ -> состояние, 0 -- начальное
+        self.finals = [False]
+        self.__register: Dict[Tuple, int] = {}
+        self.__free: List[int] = []
+        self.__path = [0]  # Состояния на пути последнего слова
+        self.__last_word = None
+        self.__finished = False
+
+    def add(self, word: str):
+        """
+        Добавление слова, слова должны идти по возрастанию (повторы пропускаются)
+        """
+        if self.__finished:
+            raise ValueError('Автомат уже построен')
+        last_word = self.__last_word
+        if last_word is not None and word <= last_word:
+            if word == last_word:
+                return
+            raise ValueError(f'Слова не отсортированы: "{word}" после "{last_word}"')
+        for sym in word:
+            if sym not in self.__alphabet_set:
+                raise ValueError(f'Символа {sym} нет в допустимом алфавите!')
+        prefix_len = 0
+        if last_word is not None:
+            max_len = min(len(word), len(last_word))
+            while prefix_len < max_len and word[prefix_len] == last_word[prefix_len]:
+                prefix_len += 1
+            self.__replace_or_register(prefix_len)
+        path = self.__path
+        for sym in word[prefix_len:]:
+            state = self.__new_state()
+            self.outputs[path[-1]][sym] = state
+            path.append(state)
+        self.finals[path[-1]] = True
+        self.__last_word = word
+
+    def __new_state(self) -> int:
+        if len(self.__free) > 0:
+            state = self.__free.pop()
+            self.outputs[state] = {}
+            self.finals[state] = False
+            return state
+        self.outputs.append({})
+        self.finals.append(False)
+        return len(self.outputs) - 1
+
+    def __replace_or_register(self, prefix_len: int):
+        """
+        Закрепление пути последнего слова глубже prefix_len
+        """
+        path, last_word = self.__path, self.__last_word
+        while len(path) > prefix_len + 1:
+            state = path.pop()
+            key = (self.finals[state], tuple(sorted(self.outputs[state].items())))
+            equivalent = self.__register.setdefault(key, state)
+            if equivalent != state:
+                self.outputs[path[-1]][last_word[len(path) - 1]] = equivalent
+                self.outputs[state] = None
+                self.__free.append(state)
+
+    def finish(self) -> 'WordsDKABuilder':
+        """
+        Закрепление последнего слова, после этого добавлять слова нельзя
+        """
+        if not self.__finished:
+            if self.__last_word is not None:
+                self.__replace_or_register(0)
+            self.__register.clear()
+            self.__finished = True
+        return self
+
+    def __numbered_states(self) -> List[int]:
+        """
+        Живые состояния в порядке обхода от начального (начальное получает номер 0)
+        """
+        order, seen = [0], {0}
+        for state in order:
+            for to_state in self.outputs[state].values():
+                if to_state not in seen:
+                    seen.add(to_state)
+                    order.append(to_state)
+        return order
+
+    def __is_empty(self) -> bool:
+        """
+        Не добавлено ни одного слова: начальное состояние само тупиковое
+        """
+        return self.__last_word is None
+
+    def to_min_dka(self) -> List[MinDFSMState]:
+        """
+        Минимальный ДКА в формате generate_min_dka_from_dka: переходы по всему алфавиту,
+        отсутствующие переходы ведут в тупиковое состояние (последнее в списке)
+        """
+        self.finish()
+        if self.__is_empty():
+            return [MinDFSMState(state='0s', dka_states=set(), outputs=[('0s', sym) for sym in self.alphabet])]
+        order = self.__numbered_states()
+        number = {state: i for i, state in enumerate(order)}
+        min_dka = [MinDFSMState(state=f'{i}{"s" if i == 0 else ""}', dka_states=set(), is_final=self.finals[state])
+                   for i, state in enumerate(order)]
+        dead = MinDFSMState(state=str(len(order)), dka_states=set())
+        for state, min_state in zip(order, min_dka):
+            outputs = self.outputs[state]
+            min_state.outputs = [(min_dka[number[outputs[sym]]].state if sym in outputs else dead.state, sym)
+                                 for sym in self.alphabet]
+        dead.outputs = [(dead.state, sym) for sym in self.alphabet]
+        return min_dka + [dead]
+
+    def to_compiled(self) -> CompiledDKA:
+        """
+        Скомпилированный ДКА сразу из построенного автомата, без промежуточных MinDFSMState
+        Символы, которых нет ни в одном слове, делят один столбец (он целиком ведет в тупиковое состояние)
+        """
+        self.finish()
+        if self.__is_empty():
+            return CompiledDKA({sym: 0 for sym in self.alphabet}, 0, [False], [0])
+        order = self.__numbered_states()
+        number = {state: i for i, state in enumerate(order)}
+        used = set()
+        for state in order:
+            used.update(self.outputs[state])
+        columns = [sym for sym in self.alphabet if sym in used]
+        symbol_ids = {sym: i for i, sym in enumerate(columns)}
+        unused_column = len(columns)
+        columns_cnt = len(columns) + (1 if len(used) < len(self.alphabet) else 0)
+        for sym in self.alphabet:
+            symbol_ids.setdefault(sym, unused_column)
+        dead = len(order)
+        table = [dead] * ((len(order) + 1) * columns_cnt)
+        for i, state in enumerate(order):
+            for sym, to_state in self.outputs[state].items():
+                table[i * columns_cnt + symbol_ids[sym]] = number[to_state]
+        finals = [self.finals[state] for state in order] + [False]
+        return CompiledDKA(symbol_ids, 0, finals, table)
+
+    @property
+    def states_cnt(self) -> int:
+        """
+        Число состояний, занятых сейчас (без тупикового)
+        """
+        return len(self.outputs) - len(self.__free)
+
+
+def generate_min_dka_from_words(words: Iterable[str], alphabet: List[str]) -> List[MinDFSMState]:
+    """
+    Минимальный ДКА, допускающий ровно слова словаря
+    :param words: Слова по возрастанию
+    :param alphabet: Допустимый алфавит
+    """
+    builder = WordsDKABuilder(alphabet)
+    for word in words:
+        builder.add(word)
+    return builder.to_min_dka()
+
+
+def compile_words(words: Iterable[str], alphabet: List[str]) -> CompiledDKA:
+    """
+    Скомпилированный минимальный ДКА для словаря (слова по возрастанию)
+    """
+    builder = WordsDKABuilder(alphabet)
+    for word in words:
+        builder.add(word)
+    return builder.to_compiled()